@@ -0,0 +1,5 @@
+"""
+Micro benchmarks for hot paths of the backend.
+
+Each module is runnable on its own, e.g. `python -m backend.benchmarks.resources`.
+"""
@@ -0,0 +1,56 @@
+"""
+Cost of fetching assignments and submissions of many courses.
+
+Runs a local mock Moodle adding a fixed latency to every call, then syncs
+all courses one id per request (previous behaviour) and with batched
+`courseids[i]`/`assignmentids[i]` requests, reporting calls and time taken.
+"""
+from backend.src.integration.client import APIClient, MoodleConfig
+from backend.src.integration.responses import responses
+from backend.tests.mockmoodle import MockMoodle
+
+import sys
+import time
+import asyncio
+
+
+COURSES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+LATENCY = 0.02
+
+
+async def one_by_one(client: APIClient) -> None:
+    for course in await client.get_courses():
+        for assignment in await client.get_course_assignments(course.id):
+            await client.get_assignment_submissions(assignment.id)
+
+
+async def batched(client: APIClient) -> None:
+    courses = await client.get_courses()
+    assignments = await client.get_courses_assignments(course.id for course in courses)
+    await client.get_assignments_submissions(
+        assignment.id for found in assignments.values() for assignment in found
+    )
+
+
+async def main() -> None:
+    # Both runs must reach Moodle, responses are not cached
+    responses.ttls = {}
+    moodle = MockMoodle(courses=COURSES, assignments=3, submissions=5, latency=LATENCY)
+    base_url = await moodle.start()
+    config = MoodleConfig(
+        username="user", password="pass", base_url=base_url, service="moodle_mobile_app"
+    )
+
+    print(f"courses: {COURSES}, latency: {LATENCY * 1000:.0f}ms, batch size: {config.batch_size}")
+    for name, sync in (("one by one", one_by_one), ("batched", batched)):
+        async with APIClient(config) as client:
+            moodle.calls.clear()
+            start = time.perf_counter()
+            await sync(client)
+            elapsed = time.perf_counter() - start
+        print(f"{name:<12} {sum(moodle.calls.values()):>6} calls {elapsed:>8.2f}s")
+    await moodle.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
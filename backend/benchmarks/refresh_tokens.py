@@ -0,0 +1,67 @@
+"""
+Throughput of refreshing access tokens with each refresh token store.
+
+Issues refresh tokens for a number of users, then looks them up
+concurrently the way /auth/token/refresh does and reports lookups per
+second. Requires a running Redis and uses the configured database.
+"""
+from backend.src.database import engine, init
+from backend.src.database.user import User
+from backend.src.database.token import stores
+
+import sys
+import time
+import uuid
+import random
+import asyncio
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+LOOKUPS = 20000
+CONCURRENCY = 50
+
+
+async def bench(store: str, users: list) -> None:
+    async with AsyncSession(engine) as session:
+        tokens = [
+            await stores[store].issue(session, await session.merge(user))
+            for user in users
+        ]
+
+    async def worker(lookups: int) -> None:
+        async with AsyncSession(engine) as session:
+            for _ in range(lookups):
+                assert await stores[store].lookup(session, random.choice(tokens))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(LOOKUPS // CONCURRENCY) for _ in range(CONCURRENCY)
+    ))
+    elapsed = time.perf_counter() - start
+    print(f"{store:<6} {LOOKUPS / elapsed:>10.0f} lookups/s")
+
+    async with AsyncSession(engine) as session:
+        for user in users:
+            await stores[store].revoke(session, await session.merge(user))
+
+
+async def main() -> None:
+    await init()
+    async with AsyncSession(engine) as session:
+        users = [
+            await User.create(session, email=f"bench-{uuid.uuid4().hex}@example.com")
+            for _ in range(USERS)
+        ]
+        for user in users:
+            await session.refresh(user)
+        session.expunge_all()
+
+    print(f"users: {USERS}, lookups: {LOOKUPS}, concurrency: {CONCURRENCY}")
+    for store in stores:
+        await bench(store, users)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Allocations per request for resources built from settings.
+
+Compares building clients on every access (previous behaviour) with
+the shared instances returned by the resource registry.
+"""
+from backend.src.config import settings
+
+import typing as t
+import asyncio
+import time
+import tracemalloc
+
+import redis
+import celery
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+
+
+ROUNDS = 1000
+
+
+def uncached() -> t.Dict[str, t.Callable[[], t.Any]]:
+    """Factories reproducing the per access construction."""
+    return {
+        "CELERY": lambda: celery.Celery(
+            settings.CELERY_TASK_QUEUE,
+            broker=str(settings.REDIS_BROKER_URI),
+            backend=str(settings.REDIS_BROKER_URI)
+        ),
+        "REDIS": lambda: redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD or None
+        ),
+        "OAUTH": lambda: AsyncOAuth2Client(
+            client_id=settings.OAUTH_CLIENT_ID,
+            client_secret=settings.OAUTH_CLIENT_SECRET,
+            scope=settings.OAUTH_CLIENT_SCOPE,
+            redirect_uri=f"{settings.PROJECT_SITE}/auth/oauth/callback"
+        ),
+    }
+
+
+def cached() -> t.Dict[str, t.Callable[[], t.Any]]:
+    """Accessors going through the resource registry."""
+    return {
+        "CELERY": lambda: settings.CELERY,
+        "REDIS": lambda: settings.REDIS,
+        "OAUTH": lambda: settings.OAUTH,
+    }
+
+
+def measure(factory: t.Callable[[], t.Any]) -> t.Tuple[float, float]:
+    """Return allocated bytes and microseconds per access."""
+    keep = [factory()]  # warm up imports and the registry
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshot = tracemalloc.take_snapshot()
+    for _ in range(ROUNDS):
+        keep.append(factory())
+    elapsed = time.perf_counter() - start
+    allocated = sum(
+        stat.size_diff for stat in
+        tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+    )
+    tracemalloc.stop()
+    return allocated / ROUNDS, elapsed / ROUNDS * 1e6
+
+
+async def main() -> None:
+    print(f"{'resource':<10}{'mode':<10}{'bytes/req':>12}{'us/req':>10}")
+    for mode, factories in (("before", uncached()), ("after", cached())):
+        for name, factory in factories.items():
+            size, duration = measure(factory)
+            print(f"{name:<10}{mode:<10}{size:>12.0f}{duration:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
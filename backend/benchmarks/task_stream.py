@@ -0,0 +1,67 @@
+"""
+Load test of task event fan-out within one API process.
+
+Opens thousands of concurrent subscriptions on the task event hub, each
+watching several tasks, publishes one status change for every task and
+measures how long it takes until every subscriber has received its events.
+Requires a running Redis.
+"""
+from backend.src.config import settings
+from backend.src.tasks.events import TaskEvent, hub, publish
+
+import sys
+import time
+import random
+import asyncio
+import tracemalloc
+
+
+SUBSCRIBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+TASKS_PER_SUBSCRIBER = 3
+TASKS = 2000
+
+
+async def subscriber(ids: list, started: asyncio.Event) -> float:
+    """Wait until events of all tasks arrived, return latency."""
+    with hub().subscribe(ids) as subscription:
+        remaining = set(ids)
+        await started.wait()
+        while remaining:
+            for event in await subscription.get(timeout=30):
+                remaining.discard(event.celery_task_id)
+        return time.perf_counter()
+
+
+async def main() -> None:
+    await hub().ready()
+    tasks = [f"bench-task-{i}" for i in range(TASKS)]
+    started = asyncio.Event()
+
+    tracemalloc.start()
+    subscribers = [
+        asyncio.create_task(subscriber(
+            random.sample(tasks, TASKS_PER_SUBSCRIBER), started
+        )) for _ in range(SUBSCRIBERS)
+    ]
+    await asyncio.sleep(0)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    started.set()
+    await asyncio.to_thread(publish, settings.REDIS, (
+        TaskEvent(celery_task_id=id, status="success") for id in tasks
+    ))
+    finished = sorted(await asyncio.gather(*subscribers))
+
+    print(f"subscribers:        {SUBSCRIBERS}")
+    print(f"events published:   {TASKS}")
+    print(f"memory/subscriber:  {memory / SUBSCRIBERS:.0f} bytes")
+    print(f"p50 delivery:       {(finished[len(finished) // 2] - start) * 1e3:.1f} ms")
+    print(f"p99 delivery:       {(finished[int(len(finished) * .99)] - start) * 1e3:.1f} ms")
+    print(f"all delivered:      {(finished[-1] - start) * 1e3:.1f} ms")
+    await hub().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,40 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.src import cache, logs, metrics
 from backend.src.config import settings
+from backend.src.resources import registry
+from backend.src.loop import monitor as loop_monitor
 from backend.src.database import init as init_db
+from backend.src.database.replica import router as replicas
 from backend.src.api import init as init_api
+from backend.src.api.middleware import (
+    MetricsMiddleware,
+    QueryStatsMiddleware,
+    RequestIdMiddleware
+)
+from backend.src.api.health import monitor as health_monitor
 
 
-import logging
 from contextlib import asynccontextmanager
 
 
-logger = logging.getLogger()
-logger.setLevel(settings.LOG_LEVEL)
-
-for handler in settings.LOG_HANDLERS:
-    logger.addHandler(handler)
+logs.setup()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    logs.listener()
+    if settings.LOOP_MONITOR:
+        loop_monitor().start()
     await init_db()
+    await settings.AIOREDIS.ping()
+    health_monitor().start()
+    cache.listener().start()
+    replicas().start()
     yield
-    # NOTE: shutdown handler (if any) goes here
+    await registry.close()
+    metrics.process_exited()
 
 
 app = FastAPI(
@@ -34,6 +47,9 @@ app = FastAPI(
 
 app.include_router(init_api(), prefix="/api")
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,3 +60,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+
+@app.get("/metrics", include_in_schema=False)
+def export_metrics() -> Response:
+    """Samples of all processes, rendered in threadpool."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,9 +1,10 @@
 from backend.src.exception import BackendException
 from backend.src.config import settings
+from backend.src.api.health import Readiness, monitor
 
 import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
 
 logger = logging.getLogger(__name__)
@@ -26,9 +27,24 @@ class AccessTokenExpired(APIException):
 
 @router.get("/healthy", summary="Health Check", description="Check the health status of the API.")
 async def healthy() -> bool:
-    """Health check endpoint to verify that the API is running."""
-    result = settings.CELERY.send_task("awwh")
-    return result.get(timeout=10)
+    """Health check endpoint to verify that the API and its dependencies are ready."""
+    readiness = await monitor().readiness()
+    return readiness.ready
+
+
+@router.get("/livez", summary="Liveness Probe", description="Check the API process is serving requests.")
+async def livez() -> bool:
+    """Liveness only depends on the process itself."""
+    return True
+
+
+@router.get("/readyz", summary="Readiness Probe", description="Last known state of database, Redis and workers.")
+async def readyz(response: Response) -> Readiness:
+    """Readiness from cached checks, responds 503 when any dependency is down."""
+    readiness = await monitor().readiness()
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness
 
 
 def init() -> APIRouter:
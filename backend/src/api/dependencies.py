@@ -1,6 +1,12 @@
+from backend.src import cache
 from backend.src.config import settings
 from backend.src.database import engine
-from backend.src.database.user import User
+from backend.src.database.replica import router as replicas
+from backend.src.database.user import (
+    User,
+    Group,
+    membership_version
+)
 from backend.src.api.models import JWTTokenPayload
 from backend.src.api import (
     InvalidAccessToken,
@@ -8,11 +14,14 @@ from backend.src.api import (
 )
 
 import typing as t
+import math
+import weakref
 
 import jwt
-import redis
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+import redis.asyncio as aioredis
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
@@ -32,8 +41,19 @@ async def _get_session() -> t.AsyncGenerator[AsyncSession, None]:
 SessionRequired = t.Annotated[AsyncSession, Depends(_get_session)]
 
 
-async def _get_current_user(session: SessionRequired, token: str = Depends(TokenRequired)) -> User:
-    """Get the current user based on the provided JWT token."""
+async def _get_redis() -> aioredis.Redis:
+    """Provide the asyncio redis client.
+
+    Clients share one connection pool per event loop, so no new connections
+    are made for each request.
+    """
+    return settings.AIOREDIS
+
+RedisRequired = t.Annotated[aioredis.Redis, Depends(_get_redis)]
+
+
+async def _get_token_payload(token: str = Depends(TokenRequired)) -> JWTTokenPayload:
+    """Decode and verify the provided JWT token."""
     try:
         decoded_jwt_token = jwt.decode(
             token,
@@ -43,34 +63,78 @@ async def _get_current_user(session: SessionRequired, token: str = Depends(Token
                 "verify_exp": False
             }
         )
-        payload = JWTTokenPayload.model_validate(decoded_jwt_token)
+        return JWTTokenPayload.model_validate(decoded_jwt_token)
     except AccessTokenExpired:
         raise HTTPException(401, "access token has expired")
     except (jwt.PyJWTError, InvalidAccessToken):
         raise HTTPException(403, "invalid credentials")
 
-    # Get user from the database
-    user = await User.query(session, id=payload.sub)
-    if user is None or user.is_disabled or user.is_deleted:
+TokenPayloadRequired = t.Annotated[JWTTokenPayload, Depends(_get_token_payload)]
+
+
+# Users are evicted once they are changed, see database.user
+principals: cache.TTLCache[str, User] = cache.TTLCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+)
+cache.register("user", principals)
+
+
+async def _get_read_session(payload: TokenPayloadRequired) -> t.AsyncGenerator[AsyncSession, None]:
+    """Provide a session for reads only, on a replica when there is any.
+
+    Current user is routed to primary for a while after it has written.
+    """
+    async with AsyncSession(await replicas().route(payload.sub)) as session:
+        yield session
+
+ReadSessionRequired = t.Annotated[AsyncSession, Depends(_get_read_session)]
+
+
+async def _get_current_user(session: SessionRequired, payload: TokenPayloadRequired) -> User:
+    """Get the current user, database is only queried on cache miss."""
+    # Writes committed by the session pin current user to primary
+    session.info["subject"] = payload.sub
+    principal = principals.get(payload.sub)
+    if principal is None:
+        user = await User.query(session, id=payload.sub)
+        if user is None:
+            raise HTTPException(422, "inactive user")
+
+        # Snapshot is detached, so it is never expired by other sessions
+        principal = User(**user.model_dump())
+        make_transient_to_detached(principal)
+        principals.set(payload.sub, principal)
+
+    if principal.is_disabled or principal.is_deleted:
         raise HTTPException(422, "inactive user")
-    return user
+    return await session.merge(principal, load=False)
 
 
 UserRequired = t.Annotated[User, Depends(_get_current_user)]
 
 
 class UserGroupsRequired:
-    """Dependency to ensure the current user belongs to a specific group."""
+    """Dependency to ensure the current user belongs to a specific group.
+
+    Groups are read from token claims, database is only queried when
+    membership of the user has changed since the token was issued.
+    """
 
     def __init__(self, *expected_groups: str):
         self.expected_groups = expected_groups
         if not expected_groups:
             raise ValueError("at least one group must be specified")
 
-    async def __call__(self, session: SessionRequired, user: UserRequired) -> User:
-        await session.refresh(user, attribute_names=["groups"])
-        user_groups = {group.name for group in user.groups}
-        if not any(group in user_groups for group in self.expected_groups):
+    async def __call__(
+        self,
+        session: SessionRequired,
+        payload: TokenPayloadRequired,
+        user: UserRequired
+    ) -> User:
+        groups = payload.groups
+        if groups is None or payload.gv is None or await membership_version(payload.sub) > payload.gv:
+            groups = await Group.list_names(session, user_id=payload.sub)
+        if not any(group in groups for group in self.expected_groups):
             raise HTTPException(403, "user does not match any group expected")
         return user
 
@@ -78,27 +142,111 @@ class UserGroupsRequired:
 class OAuthStateRequired:
     """Dependency for checking if the state parameter matches the previously submitted one."""
 
+    @staticmethod
+    def _key(state: str) -> str:
+        return f"oauth:state:{state}"
+
     @classmethod
-    async def record_state(cls, state: str, url: str, ttl: int = settings.OAUTH_CLIENT_STATE_TTL) -> None:
+    async def record_state(cls, redis: aioredis.Redis, state: str, url: str, ttl: int = settings.OAUTH_CLIENT_STATE_TTL) -> None:
         """Record state and url in Redis with TTL."""
-        await settings.REDIS.set(
-            name=f"oauth:state:{state}",
+        await redis.set(
+            name=cls._key(state),
             value=url,
             ex=ttl,
             nx=True
         )
 
-    async def __call__(self, state: str) -> None:
-        """Access state, verify and deactive it."""
-        with settings.REDIS.pipeline() as pipe:
-            try:
-                pipe.watch(state)
-                url = pipe.get(state)
-                if url is None:
-                    pipe.unwatch()
-                    raise HTTPException(403, "cannot find corresponded state")
-                pipe.multi()
-                pipe.delete(state)
-                pipe.execute()
-            except redis.WatchError:
-                raise HTTPException(403, "cannot find corresponded state")
+    async def __call__(self, state: str, redis: RedisRequired) -> str:
+        """Access state, verify and deactive it within one atomic round trip."""
+        url = await redis.getdel(self._key(state))
+        if url is None:
+            raise HTTPException(403, "cannot find corresponded state")
+        return url.decode()
+
+
+class LoginThrottle:
+    """Dependency limiting login attempts per email and per client address.
+
+    Each key is a token bucket in Redis, buckets are checked and taken from
+    by one script, so an attempt is either admitted by all buckets or by
+    none of them. Rejected attempts never reach password verification.
+    """
+
+    # KEYS are buckets, ARGV is capacity and refill rate of each bucket,
+    # returns seconds to wait or 0 when admitted. Clock of Redis is used so
+    # refill does not depend on clocks of API hosts.
+    script = """
+        local time = redis.call("TIME")
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+        local levels = {}
+        local wait = 0
+        for i, key in ipairs(KEYS) do
+            local capacity = tonumber(ARGV[i * 2 - 1])
+            local rate = tonumber(ARGV[i * 2])
+            local bucket = redis.call("HMGET", key, "tokens", "ts")
+            local level = tonumber(bucket[1]) or capacity
+            local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+            levels[i] = math.min(capacity, level + elapsed * rate)
+            if levels[i] < 1 then
+                wait = math.max(wait, (1 - levels[i]) / rate)
+            end
+        end
+        if wait > 0 then
+            return tostring(wait)
+        end
+        for i, key in ipairs(KEYS) do
+            local capacity = tonumber(ARGV[i * 2 - 1])
+            local rate = tonumber(ARGV[i * 2])
+            redis.call("HSET", key, "tokens", tostring(levels[i] - 1), "ts", tostring(now))
+            redis.call("EXPIRE", key, math.ceil(capacity / rate))
+        end
+        return "0"
+    """
+
+    def __init__(
+        self,
+        email_burst: int = settings.LOGIN_THROTTLE_EMAIL_BURST,
+        email_per_minute: float = settings.LOGIN_THROTTLE_EMAIL_PER_MINUTE,
+        ip_burst: int = settings.LOGIN_THROTTLE_IP_BURST,
+        ip_per_minute: float = settings.LOGIN_THROTTLE_IP_PER_MINUTE
+    ) -> None:
+        self.email_bucket = (email_burst, email_per_minute / 60)
+        self.ip_bucket = (ip_burst, ip_per_minute / 60)
+        # Scripts are bound to clients, clients are kept per event loop
+        self._scripts: weakref.WeakKeyDictionary[
+            aioredis.Redis, t.Any
+        ] = weakref.WeakKeyDictionary()
+
+    def _script(self, redis: aioredis.Redis) -> t.Any:
+        script = self._scripts.get(redis)
+        if script is None:
+            script = self._scripts[redis] = redis.register_script(self.script)
+        return script
+
+    async def acquire(self, redis: aioredis.Redis, email: str, ip: str) -> float:
+        """Take one token from both buckets, return seconds to wait if rejected."""
+        wait = await self._script(redis)(
+            keys=[
+                f"throttle:login:email:{email.strip().lower()}",
+                f"throttle:login:ip:{ip}"
+            ],
+            args=[*self.email_bucket, *self.ip_bucket]
+        )
+        return float(wait)
+
+    async def __call__(
+        self,
+        request: Request,
+        form: t.Annotated[OAuth2PasswordRequestForm, Depends()],
+        redis: RedisRequired
+    ) -> None:
+        ip = request.client.host if request.client else "unknown"
+        wait = await self.acquire(redis, form.username, ip)
+        if wait > 0:
+            raise HTTPException(
+                429, "too many login attempts",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+
+LoginThrottled = Depends(LoginThrottle())
@@ -0,0 +1,146 @@
+"""
+Readiness checks of backend dependencies.
+
+Checks run in a background refresher and results are cached, so probes
+are answered instantly without touching database, Redis or workers.
+"""
+from backend.src.config import settings
+from backend.src.database import engine
+from backend.src.resources import registry
+
+import typing as t
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+
+logger = logging.getLogger(__name__)
+
+
+class CheckResult(SQLModel):
+    """Result of checking one dependency."""
+    healthy: bool
+    latency: float
+    error: str | None = None
+    checked_at: datetime
+
+
+class Readiness(SQLModel):
+    """Last known state of all dependencies."""
+    ready: bool
+    checks: t.Dict[str, CheckResult]
+
+
+async def check_database() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def check_redis() -> None:
+    await settings.AIOREDIS.ping()
+
+
+async def check_worker() -> None:
+    # Broadcast ping is blocking, keep it away from event loop
+    replies = await asyncio.to_thread(
+        settings.CELERY.control.ping, timeout=settings.HEALTH_CHECK_TIMEOUT / 2
+    )
+    if not replies:
+        raise RuntimeError("no worker replied")
+
+
+class HealthMonitor:
+    """Refresh dependency checks periodically and cache their results."""
+
+    checks: t.Dict[str, t.Callable[[], t.Awaitable[None]]] = {
+        "database": check_database,
+        "redis": check_redis,
+        "worker": check_worker,
+    }
+
+    def __init__(
+        self,
+        interval: float = settings.HEALTH_CHECK_INTERVAL,
+        ttl: float = settings.HEALTH_CHECK_TTL,
+        timeout: float = settings.HEALTH_CHECK_TIMEOUT
+    ) -> None:
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.results: t.Dict[str, CheckResult] = {}
+        self._refreshed_at: float | None = None
+        self._refreshing: asyncio.Task | None = None
+        self._refresher: asyncio.Task | None = None
+
+    async def _check(self, name: str) -> CheckResult:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.checks[name](), self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            error = "timed out"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if error:
+            logger.warning(f"health check {name} failed: {error}")
+        return CheckResult(
+            healthy=error is None,
+            latency=(time.perf_counter() - start) * 1000,
+            error=error,
+            checked_at=datetime.now(timezone.utc)
+        )
+
+    async def _refresh(self) -> None:
+        results = await asyncio.gather(*(self._check(name) for name in self.checks))
+        self.results = dict(zip(self.checks, results))
+        self._refreshed_at = time.monotonic()
+
+    def refresh(self) -> asyncio.Task:
+        """Refresh all checks concurrently, concurrent callers share one run."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
+
+    async def readiness(self) -> Readiness:
+        """Return last known state, only the very first call waits for checks."""
+        if self._refreshed_at is None:
+            await self.refresh()
+        elif time.monotonic() - self._refreshed_at > self.ttl:
+            # Refresher is not running, update in background for next probes
+            self.refresh()
+        return Readiness(
+            ready=all(result.healthy for result in self.results.values()),
+            checks=self.results
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start background refresher."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop background refresher."""
+        for task in (self._refresher, self._refreshing):
+            if task is None or task.done():
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def monitor() -> HealthMonitor:
+    """Get health monitor of current event loop."""
+    return registry.get(
+        "HEALTH", HealthMonitor, closer=HealthMonitor.stop, per_loop=True
+    )
@@ -0,0 +1,133 @@
+"""
+Pure ASGI middlewares, they neither buffer bodies nor spawn tasks.
+"""
+from backend.src import logs, metrics
+from backend.src.config import settings
+from backend.src.database.instrument import collect
+
+import re
+import time
+import uuid
+import logging
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of route handling request, labels stay bounded."""
+    route = scope.get("route")
+    if route is None:
+        # Router has not run yet, match routes the same way it does
+        for candidate in scope["app"].router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+class RequestIdMiddleware:
+    """Tag logs of request with id from X-Request-ID, and echo it back."""
+
+    pattern = re.compile(rb"[\w\-.]{1,64}")
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"")
+        current = (
+            incoming.decode() if self.pattern.fullmatch(incoming)
+            else uuid.uuid4().hex
+        )
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-request-id", current.encode()),
+                ]
+            await send(message)
+
+        token = logs.request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            logs.request_id.reset(token)
+
+
+class MetricsMiddleware:
+    """Record count, latency and in-flight requests of each route."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method, route = scope["method"], route_template(scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = metrics.HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            metrics.HTTP_REQUEST_DURATION.labels(method, route).observe(
+                time.perf_counter() - start
+            )
+            metrics.HTTP_REQUESTS.labels(method, route, str(status)).inc()
+
+
+class QueryStatsMiddleware:
+    """Count statements executed for each request.
+
+    Outside production counts are returned in X-DB-Queries and X-DB-Time
+    (milliseconds) headers. Repeated statement shapes are logged as
+    probable N+1 queries.
+    """
+
+    def __init__(self, app: ASGIApp, headers: bool = settings.ENVIRONMENT != "prod") -> None:
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with collect() as stats:
+            async def send_with_stats(message: Message) -> None:
+                if message["type"] == "http.response.start" and self.headers:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-queries", str(stats.count).encode()),
+                        (b"x-db-time", f"{stats.duration * 1000:.2f}".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
+        metrics.HTTP_REQUEST_DB_QUERIES.labels(
+            scope["method"], route_template(scope)
+        ).observe(stats.count)
+        for shape, count in stats.repeated(settings.DB_N_PLUS_ONE_THRESHOLD):
+            logger.warning(
+                f"{scope['method']} {scope['path']} executed statement "
+                f"{count} times, probable N+1 query: {shape}"
+            )
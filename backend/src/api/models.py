@@ -1,17 +1,22 @@
 from backend.src.config import settings
 from backend.src.database.user import (
     User,
-    RefreshToken
+    Group,
+    membership_version
 )
+from backend.src.database.token import refresh_tokens
 from backend.src.api import (
     InvalidAccessToken,
     AccessTokenExpired
 )
 
+import typing as t
 import typing_extensions as te
+import uuid
 from datetime import datetime, timezone, timedelta
 
 import jwt
+from sqlalchemy import inspect
 from sqlmodel import SQLModel
 from pydantic import model_validator
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -21,6 +26,9 @@ class JWTTokenPayload(SQLModel):
     sub: str
     iat: datetime
     exp: datetime
+    # Names of groups of the user and version of membership they were read at
+    groups: t.List[str] | None = None
+    gv: int | None = None
 
     @model_validator(mode="after")
     def validate_token_timestamp(self) -> te.Self:
@@ -37,54 +45,64 @@ class JWTToken(SQLModel):
     refresh_token: str
     token_type: str = "bearer"
 
-    @classmethod
-    async def create(cls, session: AsyncSession, user: User) -> te.Self:
-        """Create a new JWT token."""
-        refresh_token = await RefreshToken.create(session, user=user)
+    @staticmethod
+    async def _sign(
+        session: AsyncSession,
+        user_id: uuid.UUID,
+        groups: t.List[str] | None = None
+    ) -> str:
+        """Sign access token carrying group claims of the user.
+
+        Group names are read from database unless given.
+        """
+        # Version is read first, so changes made meanwhile mark claims stale
+        version = await membership_version(user_id)
+        if groups is None:
+            groups = await Group.list_names(session, user_id=user_id)
         now = datetime.now(timezone.utc)
-        await session.refresh(user)
         payload = JWTTokenPayload(
-            sub=str(user.id), iat=now,
-            exp=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+            sub=str(user_id), iat=now,
+            exp=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+            groups=groups, gv=version
         )
-        access_token = jwt.encode(
-            payload.model_dump(),
+        return jwt.encode(
+            payload.model_dump(exclude_none=True),
             key=settings.SECRET_KEY,
             algorithm=settings.JWT_ALGORITHM
         )
-        await session.refresh(refresh_token)
+
+    @classmethod
+    async def create(cls, session: AsyncSession, user: User) -> te.Self:
+        """Create a new JWT token.
+
+        Groups loaded along with the user are used for claims as they are.
+        """
+        state = inspect(user)
+        user_id = state.identity[0]
+        groups = None
+        if "groups" not in state.unloaded:
+            groups = [group.name for group in user.groups]
+        # Issuing may commit, which expires the user
+        refresh_token = await refresh_tokens().issue(session, user)
+        access_token = await cls._sign(session, user_id, groups)
         return cls(
             access_token=access_token,
-            refresh_token=refresh_token.content
+            refresh_token=refresh_token
         )
 
     @classmethod
     async def refresh(cls, session: AsyncSession, content: str) -> te.Self:
         """Refresh access token by refresh token."""
-        refresh_token = await RefreshToken.query(session, content=content)
-        if not refresh_token:
-            raise ValueError("refresh token not found")
-        now = datetime.now(timezone.utc)
-        if refresh_token.valid_before <= now.replace(tzinfo=None):
-            raise ValueError("refresh token expired, please re-login")
-        payload = JWTTokenPayload(
-            sub=str(refresh_token.user_id), iat=now,
-            exp=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
-        access_token = jwt.encode(
-            payload.model_dump(),
-            key=settings.SECRET_KEY,
-            algorithm=settings.JWT_ALGORITHM
-        )
+        user_id = await refresh_tokens().lookup(session, content)
+        if user_id is None:
+            raise ValueError("refresh token not found or expired, please re-login")
+        access_token = await cls._sign(session, user_id)
         return cls(
             access_token=access_token,
-            refresh_token=refresh_token.content
+            refresh_token=content
         )
 
     @staticmethod
     async def destroy(session: AsyncSession, user: User) -> None:
-        """Destroy refresh token for user logging out."""
-        refresh_token = await RefreshToken.query(session, user=user)
-        if not refresh_token:
-            return
-        await refresh_token.delete(session)
+        """Destroy refresh tokens for user logging out."""
+        await refresh_tokens().revoke(session, user)
@@ -8,9 +8,11 @@ from backend.src.config import settings
 from backend.src.database.user import (
     User,
     InvalidLogin,
+    UserAlreadyExists,
     Authentication,
     PasswordAuthentication
 )
+from backend.src.database.password import PasswordHasherBusy
 
 import typing as t
 import uuid
@@ -27,6 +29,14 @@ UnauthorizedResponses: t.Dict = {
     422: {"description": "inactive user"},
 }
 
+BusyResponses: t.Dict = {
+    503: {"description": "too many password hashing calls waiting"},
+}
+
+
+def _busy(error: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(503, str(error), headers={"Retry-After": "1"})
+
 
 class GroupInfo(SQLModel):
     """Group information returned to frontend."""
@@ -55,7 +65,11 @@ class UserPasswordRegistration(SQLModel):
     "/basic/login",
     summary="Generate JWT Token using Password authentication",
     description="Generate a JWT token for user authentication.",
-    responses=UnauthorizedResponses
+    responses={
+        **UnauthorizedResponses, **BusyResponses,
+        429: {"description": "too many login attempts"}
+    },
+    dependencies=[dependencies.LoginThrottled]
 )
 async def generate_token(
     session: dependencies.SessionRequired,
@@ -71,6 +85,8 @@ async def generate_token(
         )
     except InvalidLogin as error:
         raise HTTPException(401, f"invalid credentials - {error}")
+    except PasswordHasherBusy as error:
+        raise _busy(error)
     if user.is_disabled or user.is_deleted:
         raise HTTPException(422, "inactive user")
     return await JWTToken.create(session, user)
@@ -101,26 +117,28 @@ async def read_current_user(
 @router.post(
     "/basic/register",
     summary="Register User login with password",
-    description="Register a new user."
+    description="Register a new user.",
+    responses={
+        **BusyResponses,
+        409: {"description": "email has been registered"}
+    }
 )
 async def register_user(
     session: dependencies.SessionRequired,
     form: UserPasswordRegistration
 ) -> UserInfo:
     """Register a new user."""
-    user = await User.create(
-        session,
-        email=form.email,
-        name=form.name
-    )
-    if not user:
-        raise HTTPException(400, "user registration failed")
-    auth = await PasswordAuthentication.create(
-        session,
-        user=user,
-        password=form.password
-    )
-    await user.bind_auth_method(session, auth=auth)
+    try:
+        user = await User.register(
+            session,
+            email=form.email,
+            name=form.name,
+            password=form.password
+        )
+    except UserAlreadyExists as error:
+        raise HTTPException(409, str(error))
+    except PasswordHasherBusy as error:
+        raise _busy(error)
     return UserInfo(**user.model_dump())
 
 
@@ -164,12 +182,12 @@ class OAuthRedirectURL(SQLModel):
     summary="Get OAuth2 login redirect URL",
     description="Redirect to given URL for authtication."
 )
-async def redirect_oauth_login() -> OAuthRedirectURL:
+async def redirect_oauth_login(redis: dependencies.RedisRequired) -> OAuthRedirectURL:
     """Redirect user to OAuth server site."""
     url, state = settings.OAUTH.create_authorization_url(
         url=settings.OAUTH_SERVER_URL
     )
-    await dependencies.OAuthStateRequired.record_state(state, url)
+    await dependencies.OAuthStateRequired.record_state(redis, state, url)
     return OAuthRedirectURL(url=url)
 
 
@@ -199,7 +217,11 @@ if settings.ENVIRONMENT == "test":
         description="A confidential endpoint accessible only to users in the 'test-group' group.",
         dependencies=[Depends(dependencies.UserGroupsRequired("test-group"))],
     )
-    async def confidential(user: dependencies.UserRequired) -> t.List[GroupInfo]:
+    async def confidential(
+        session: dependencies.SessionRequired,
+        user: dependencies.UserRequired
+    ) -> t.List[GroupInfo]:
+        await session.refresh(user, attribute_names=["groups"])
         return [
             GroupInfo(
                 **group.model_dump(include={"id", "name", "description"})
@@ -2,46 +2,220 @@ import logging
 from datetime import datetime
 
 from backend.src.api import dependencies
+from backend.src.config import settings
+from backend.src.database import engine
 from backend.src.database.task import (
     Task,
-    TaskStatus
+    TaskStatus,
+    TaskStatusFinal
 )
+from backend.src.tasks import events
 
+import typing as t
 import uuid
-from sqlmodel import SQLModel
-from fastapi import APIRouter, HTTPException
+import asyncio
+from sqlmodel import SQLModel, Field
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 
 router = APIRouter(prefix="/task", tags=["task"])
 logger = logging.getLogger(__name__)
 
+# Task status is written by API itself in pull mode, reads go to primary then.
+# Streaming and waiting subscribe before reading, they always read primary.
+SessionRequired = (
+    dependencies.ReadSessionRequired if settings.TASK_STATUS_PUSH
+    else dependencies.SessionRequired
+)
+
 
 class TaskResult(SQLModel):
     """Task information returned to frontend."""
     id: uuid.UUID
-    celery_task_result: str
+    celery_task_result: str | None = None
     status: TaskStatus
     created_at: datetime
-    updated_at: datetime
+    updated_at: datetime | None = None
+
+
+class TaskBatchQuery(SQLModel):
+    """Tasks queried at once."""
+    ids: t.List[uuid.UUID] = Field(
+        min_length=1, max_length=settings.TASK_BATCH_MAX_IDS
+    )
+
+
+@router.post(
+    "/batch",
+    summary="Get tasks by IDs",
+    description="Retrieve status of multiple tasks at once, tasks not found or not owned are omitted."
+)
+async def get_tasks_by_ids(
+    query: TaskBatchQuery,
+    session: SessionRequired,
+    user: dependencies.UserRequired
+) -> t.List[TaskResult]:
+    tasks = await Task.query_many(
+        session, [str(id) for id in set(query.ids)], owner_id=user.id
+    )
+    await Task.update_many(session, tasks)
+    return [
+        TaskResult(**task.model_dump(include={
+            "id", "celery_task_result", "status", "created_at", "updated_at"
+        })) for task in tasks
+    ]
+
+
+async def _current_events(results: t.Iterable[TaskResult]) -> t.List[events.TaskEvent]:
+    """Read current status of tasks from database as events."""
+    async with AsyncSession(engine) as session:
+        tasks = await Task.query_many(session, [str(result.id) for result in results])
+        await Task.update_many(session, tasks)
+        return [
+            events.TaskEvent(
+                celery_task_id=task.celery_task_id,
+                status=task.status.value,
+                result=task.celery_task_result,
+                updated_at=task.updated_at
+            ) for task in tasks
+        ]
+
+
+@router.get(
+    "/stream",
+    summary="Stream tasks status",
+    description="Stream status changes of tasks as Server-Sent Events until all of them are finished.",
+    response_class=StreamingResponse,
+    responses={503: {"description": "Task events are unavailable"}}
+)
+async def stream_tasks(
+    session: dependencies.SessionRequired,
+    user: dependencies.UserRequired,
+    ids: t.Annotated[t.List[uuid.UUID], Query(
+        alias="id", min_length=1, max_length=settings.TASK_STREAM_MAX_IDS
+    )]
+) -> StreamingResponse:
+    tasks = await Task.query_many(session, [str(id) for id in set(ids)])
+    if len(tasks) != len(set(ids)):
+        raise HTTPException(status_code=404, detail="task not found")
+    if any(task.owner_id != user.id for task in tasks):
+        raise HTTPException(status_code=403, detail="not authorized access")
+
+    # Subscribe before reading current status so no transition is missed
+    hub = events.hub()
+    try:
+        await asyncio.wait_for(hub.ready(), settings.TASK_EVENTS_READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="task events unavailable")
+    subscription = hub.subscribe(task.celery_task_id for task in tasks)
+    await Task.update_many(session, tasks)
+    results = {
+        task.celery_task_id: TaskResult(**task.model_dump(include={
+            "id", "celery_task_result", "status", "created_at", "updated_at"
+        })) for task in tasks
+    }
+
+    # Database connection is not needed anymore while streaming
+    await session.close()
+
+    async def stream() -> t.AsyncGenerator[str, None]:
+        with subscription:
+            pending = {}
+            for celery_task_id, result in results.items():
+                yield f"data: {result.model_dump_json()}\n\n"
+                if result.status not in TaskStatusFinal:
+                    pending[celery_task_id] = result
+
+            while pending:
+                changes = await subscription.get(settings.TASK_STREAM_HEARTBEAT)
+                if not changes or subscription.missed:
+                    # Events may have been lost, database is checked instead
+                    subscription.missed = False
+                    changes += await _current_events(pending.values())
+                sent = False
+                for event in changes:
+                    result = pending.get(event.celery_task_id)
+                    if result is None or result.status == event.status:
+                        continue
+                    result = result.model_copy(update={
+                        "status": TaskStatus(event.status),
+                        "celery_task_result": event.result,
+                        "updated_at": event.updated_at
+                    })
+                    yield f"data: {result.model_dump_json()}\n\n"
+                    sent = True
+                    if result.status in TaskStatusFinal:
+                        del pending[event.celery_task_id]
+                    else:
+                        pending[event.celery_task_id] = result
+                if not sent:
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _wait_finished(subscription: events.Subscription, timeout: float) -> None:
+    """Wait until subscribed task reaches a final state or timeout expires."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while (remaining := deadline - loop.time()) > 0:
+        for event in await subscription.get(remaining):
+            if TaskStatus(event.status) in TaskStatusFinal:
+                return
+
+
+async def _reload(id: str) -> Task:
+    """Read task from primary, replicas may lag behind events published."""
+    async with AsyncSession(engine) as session:
+        task = await Task.query(session, id=id)
+        if not task:
+            raise HTTPException(status_code=404, detail="task not found")
+        return await task.update(session)
 
 
 @router.get(
     "/{id}",
     summary="Get task by ID",
-    description="Retrieve a task status by its ID."
+    description="Retrieve a task status by its ID, optionally waiting up to `wait` seconds for it to finish."
 )
 async def get_task_by_id(
     id: str,
-    session: dependencies.SessionRequired,
-    user: dependencies.UserRequired
+    session: SessionRequired,
+    user: dependencies.UserRequired,
+    wait: t.Annotated[float, Query(ge=0, le=settings.TASK_WAIT_MAX)] = 0
 ) -> TaskResult:
     task = await Task.query(session, id=id)
     if not task:
         raise HTTPException(status_code=404, detail="task not found")
-    await session.refresh(user)
     if task.owner_id != user.id:
         raise HTTPException(status_code=403, detail="not authorized access")
     await task.update(session)
+
+    if wait and task.status not in TaskStatusFinal:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        # Database connection is released while request is parked
+        await session.close()
+        hub = events.hub()
+        try:
+            await asyncio.wait_for(hub.ready(), wait)
+        except asyncio.TimeoutError:
+            # Events are unavailable, current status is answered instead
+            logger.warning(f"task events unavailable while waiting for task {id}")
+        else:
+            # Subscribe before checking again so the transition cannot be missed
+            with hub.subscribe([task.celery_task_id]) as subscription:
+                task = await _reload(id)
+                if task.status not in TaskStatusFinal:
+                    await _wait_finished(subscription, deadline - loop.time())
+                    task = await _reload(id)
+
     return TaskResult(**task.model_dump(include={
         "id", "celery_task_result", "status", "created_at", "updated_at"
     }))
@@ -0,0 +1,154 @@
+"""
+In-process caches with invalidation broadcast between processes.
+
+Caches are registered under a namespace. Invalidating keys of a namespace
+evicts them locally at once and publishes them through Redis, so every
+other process subscribed to the channel evicts them too.
+"""
+from backend.src.config import settings
+from backend.src.resources import registry
+
+import typing as t
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+import redis.asyncio as aioredis
+
+
+logger = logging.getLogger(__name__)
+
+K = t.TypeVar("K")
+V = t.TypeVar("V")
+
+
+class TTLCache(t.Generic[K, V]):
+    """Bounded LRU cache whose entries expire after ttl seconds.
+
+    Not thread-safe, it is meant to be used from event loop only.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[K, t.Tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_caches: t.Dict[str, t.List[TTLCache]] = {}
+_broadcasts: t.Set[asyncio.Task] = set()
+
+
+def register(namespace: str, cache: TTLCache) -> None:
+    """Register cache to be invalidated under namespace."""
+    _caches.setdefault(namespace, []).append(cache)
+
+
+def _evict(namespace: str, keys: t.Sequence[str]) -> None:
+    for cache in _caches.get(namespace, []):
+        if not keys:
+            cache.clear()
+        for key in keys:
+            cache.pop(key)
+
+
+async def _publish(namespace: str, keys: t.Sequence[str]) -> None:
+    try:
+        await settings.AIOREDIS.publish(
+            settings.CACHE_INVALIDATION_CHANNEL,
+            json.dumps({"namespace": namespace, "keys": list(keys)})
+        )
+    except Exception as error:
+        logger.warning(f"failed to broadcast invalidation of {namespace}: {error}")
+
+
+def invalidate(namespace: str, *keys: str) -> None:
+    """Evict keys of namespace in all processes, evict everything without keys.
+
+    Local caches are evicted at once, broadcast is published in background
+    when called within an event loop.
+    """
+    _evict(namespace, keys)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_publish(namespace, keys))
+    _broadcasts.add(task)
+    task.add_done_callback(_broadcasts.discard)
+
+
+class InvalidationListener:
+    """Evict local caches on invalidations published by other processes."""
+
+    def __init__(self, client: aioredis.Redis) -> None:
+        self.client = client
+        self._reader: asyncio.Task | None = None
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        _evict(data["namespace"], data["keys"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # Entries could be missed while disconnected, drop all of them
+                for namespace in _caches:
+                    _evict(namespace, [])
+                logger.error(f"cache invalidation subscription lost: {error}")
+                await asyncio.sleep(1)
+
+    def start(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def stop(self) -> None:
+        if self._reader is None:
+            return
+        self._reader.cancel()
+        try:
+            await self._reader
+        except asyncio.CancelledError:
+            pass
+
+
+def listener() -> InvalidationListener:
+    """Get invalidation listener of current event loop."""
+    return registry.get(
+        "CACHE_INVALIDATION", lambda: InvalidationListener(settings.AIOREDIS),
+        closer=InvalidationListener.stop, per_loop=True
+    )
@@ -8,9 +8,12 @@ from pydantic import (
     computed_field
 )
 import redis
+import redis.asyncio as aioredis
 import celery
 from authlib.integrations.httpx_client import AsyncOAuth2Client
 
+from backend.src.resources import registry
+
 import typing as t
 import logging
 import logging.handlers as lhandlers
@@ -37,8 +40,31 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: t.Literal["HS256"] = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7 * 2
+    REFRESH_TOKEN_STORE: t.Literal["redis", "sql"] = "redis"
     CORS_ORIGINS: t.List[str] = ["*"]
 
+    # Password hashing pool, calls beyond queue limit are rejected with 503
+    PASSWORD_HASH_EXECUTOR: t.Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+
+    # Login attempts token buckets, burst size and refill per minute
+    LOGIN_THROTTLE_EMAIL_BURST: int = 5
+    LOGIN_THROTTLE_EMAIL_PER_MINUTE: float = 5
+    LOGIN_THROTTLE_IP_BURST: int = 30
+    LOGIN_THROTTLE_IP_PER_MINUTE: float = 30
+
+    # Health checks of dependencies, refreshed in background
+    HEALTH_CHECK_INTERVAL: float = 10
+    HEALTH_CHECK_TTL: float = 30
+    HEALTH_CHECK_TIMEOUT: float = 3
+
+    # Event loop lag monitor, stalls over threshold are logged with stack
+    LOOP_MONITOR: bool = False
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_LAG_THRESHOLD: float = 0.25
+    LOOP_LAG_WINDOW: int = 600
+
     # Logger settings
     LOG_LEVEL: t.Literal[
         "DEBUG", "INFO", "WARNING",
@@ -48,24 +74,63 @@ class Settings(BaseSettings):
     LOG_FILE: str = f"logs/{PROJECT_NAME}.log"
     LOG_FILE_MAXSIZE: int = 1024 * 1024
     LOG_FILE_AUTOBACKUP: int = 10
+    LOG_JSON: bool = False
+    # Records are written by a background thread, queue beyond size drops them
+    LOG_QUEUE_SIZE: int = 10000
+    # Fraction of DEBUG records kept in production, sampled by request
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
 
     @computed_field
     @property
     def LOG_HANDLERS(self) -> t.List[logging.Handler]:
-        handlers = []
-        handlers.append(logging.StreamHandler())
-        if self.LOG_FILE:
-            handler = lhandlers.RotatingFileHandler(
-                self.LOG_FILE,
-                maxBytes=self.LOG_FILE_MAXSIZE,
-                backupCount=self.LOG_FILE_AUTOBACKUP,
-            )
-            handlers.append(handler)
-        return handlers
+        """Build log handlers once, the log file is kept open.
+
+        Handlers are driven by the listener thread of logging queue.
+        """
+        def build() -> t.List[logging.Handler]:
+            handlers: t.List[logging.Handler] = []
+            handlers.append(logging.StreamHandler())
+            if self.LOG_FILE:
+                handler = lhandlers.RotatingFileHandler(
+                    self.LOG_FILE,
+                    maxBytes=self.LOG_FILE_MAXSIZE,
+                    backupCount=self.LOG_FILE_AUTOBACKUP,
+                )
+                handlers.append(handler)
+            return handlers
+
+        def close(handlers: t.List[logging.Handler]) -> None:
+            for handler in handlers:
+                handler.close()
+
+        return registry.get("LOG_HANDLERS", build, closer=close)
 
     # Moodle integration settings
     MOODLE_BASE_URL: str = "https://moodle.example.com/m"
 
+    # Connection pool shared by Moodle clients, timeouts are in seconds
+    MOODLE_HTTP_LIMIT: int = 100
+    MOODLE_HTTP_LIMIT_PER_HOST: int = 20
+    MOODLE_HTTP_KEEPALIVE: float = 30
+    MOODLE_HTTP_DNS_TTL: int = 300
+    MOODLE_HTTP_TIMEOUT: float = 30
+    MOODLE_HTTP_CONNECT_TIMEOUT: float = 5
+
+    # Tokens and site info of Moodle accounts, encrypted in Redis
+    MOODLE_TOKEN_TTL: int = 60 * 60 * 12
+    MOODLE_TOKEN_LOCAL_TTL: float = 300
+    MOODLE_TOKEN_CACHE_SIZE: int = 1000
+
+    # Read-only web service responses cached per function, in seconds,
+    # served stale for a while beyond their TTL while being refreshed
+    MOODLE_RESPONSE_TTL: t.Dict[str, float] = {
+        "core_webservice_get_site_info": 3600,
+        "core_enrol_get_users_courses": 300,
+        "mod_assign_get_assignments": 300,
+    }
+    MOODLE_RESPONSE_STALE: float = 600
+    MOODLE_RESPONSE_CACHE_SIZE: int = 10000
+
     # Development and testing configurations
     MOODLE_USERNAME: str = "user"
     MOODLE_PASSWORD: str = "pass"
@@ -83,6 +148,25 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = ""
+    # Connection pool of Postgres, connections of all replicas of API and
+    # workers, pool size plus overflow each, must fit max_connections
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Transaction pooling mode of PgBouncer, disables statement caches
+    DB_PGBOUNCER: bool = False
+    # Read replicas, checked in background and skipped while lagging, users
+    # read from primary for a while after they have written
+    DATABASE_REPLICA_URIS: t.List[str] = []
+    DB_REPLICA_CHECK_INTERVAL: float = 5
+    DB_REPLICA_MAX_LAG: float = 10
+    DB_REPLICA_PIN_SECONDS: float = 5
+
+    # Statement shapes repeated this many times in a request are logged
+    DB_N_PLUS_ONE_THRESHOLD: int = 5
 
     @computed_field
     @property
@@ -121,29 +205,77 @@ class Settings(BaseSettings):
     # Celery dispatcher settings
     CELERY_TASK_QUEUE: str = "tasks"
 
+    # Workers write task status into database by signals when enabled,
+    # otherwise status is pulled from result backend when task is queried
+    TASK_STATUS_PUSH: bool = True
+    TASK_STATUS_FLUSH_INTERVAL: float = 0.5
+    TASK_STATUS_BATCH_SIZE: int = 500
+    TASK_STATUS_RETRIES: int = 20
+
+    # Task status events streamed to clients
+    TASK_EVENTS_CHANNEL: str = "task:events"
+    TASK_EVENTS_READY_TIMEOUT: float = 5
+    TASK_STREAM_HEARTBEAT: float = 15
+    TASK_STREAM_MAX_IDS: int = 100
+    TASK_BATCH_MAX_IDS: int = 500
+    TASK_WAIT_MAX: float = 30
+
+    # Workers serve Prometheus metrics on this port when set
+    METRICS_WORKER_PORT: int | None = None
+
     @computed_field
     @property
     def CELERY(self) -> celery.Celery:
         """Build celery instance using settings."""
-        return celery.Celery(
+        return registry.get("CELERY", lambda: celery.Celery(
             self.CELERY_TASK_QUEUE,
             broker=str(self.REDIS_BROKER_URI),
-            backend=str(self.REDIS_BROKER_URI)
-        )
+            backend=str(self.REDIS_BROKER_URI),
+            include=["backend.src.tasks.signals"]
+        ), closer=celery.Celery.close)
+
+    @computed_field
+    @property
+    def AIOREDIS_BROKER(self) -> aioredis.Redis:
+        """Build asyncio redis client for reading Celery result backend."""
+        return registry.get("AIOREDIS_BROKER", lambda: aioredis.Redis.from_url(
+            str(self.REDIS_BROKER_URI),
+            max_connections=self.REDIS_MAX_CONNECTIONS
+        ), closer=aioredis.Redis.aclose, per_loop=True)
 
     # Redis parameters
     REDIS_DB: int = 1
+    REDIS_MAX_CONNECTIONS: int = 64
 
     @computed_field
     @property
     def REDIS(self) -> redis.Redis:
         """Build global redis session."""
-        return redis.Redis(
+        return registry.get("REDIS", lambda: redis.Redis(
             host=self.REDIS_HOST,
             port=self.REDIS_PORT,
             db=self.REDIS_DB,
             password=self.REDIS_PASSWORD or None
-        )
+        ), closer=redis.Redis.close)
+
+    @computed_field
+    @property
+    def AIOREDIS(self) -> aioredis.Redis:
+        """Build asyncio redis client, connection pool is shared in event loop."""
+        return registry.get("AIOREDIS", lambda: aioredis.Redis.from_pool(
+            aioredis.ConnectionPool(
+                host=self.REDIS_HOST,
+                port=self.REDIS_PORT,
+                db=self.REDIS_DB,
+                password=self.REDIS_PASSWORD or None,
+                max_connections=self.REDIS_MAX_CONNECTIONS
+            )
+        ), closer=aioredis.Redis.aclose, per_loop=True)
+
+    # In-process caches, invalidations are broadcast through Redis
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 60
 
     # OAuth login parameters
     OAUTH_CLIENT_ID: str = "xxxxxx-xxxxxxx-xxxxxxx-xxxxxxx"
@@ -158,13 +290,13 @@ class Settings(BaseSettings):
     @computed_field
     @property
     def OAUTH(self) -> AsyncOAuth2Client:
-        """Build OAuth 2 client."""
-        return AsyncOAuth2Client(
+        """Build OAuth 2 client, its HTTP connections are bound to event loop."""
+        return registry.get("OAUTH", lambda: AsyncOAuth2Client(
             client_id=self.OAUTH_CLIENT_ID,
             client_secret=self.OAUTH_CLIENT_SECRET,
             scope=self.OAUTH_CLIENT_SCOPE,
             redirect_uri=f"{self.PROJECT_SITE}/auth/oauth/callback"
-        )
+        ), closer=AsyncOAuth2Client.aclose, per_loop=True)
 
 
 settings = Settings()
@@ -1,13 +1,49 @@
 from backend.src.exception import BackendException
 from backend.src.config import settings
+from backend.src.database.instrument import instrument, InstrumentedQueuePool
 
+import typing as t
+import uuid
 import logging
 
 from sqlmodel import SQLModel
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 
 logger = logging.getLogger(__name__)
-engine = create_async_engine(str(settings.DATABASE_URI))
+
+
+def engine_options(uri: str) -> t.Dict[str, t.Any]:
+    """Build engine options from settings, pool is only sized for Postgres."""
+    if make_url(uri).get_backend_name() != "postgresql":
+        return {}
+    options: t.Dict[str, t.Any] = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+    if settings.DB_PGBOUNCER:
+        # Server connections change between transactions behind PgBouncer,
+        # prepared statements must neither be cached nor share names.
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+engine = create_async_engine(
+    str(settings.DATABASE_URI), **engine_options(str(settings.DATABASE_URI))
+)
+instrument(engine)
 
 
 async def init() -> AsyncEngine:
@@ -31,3 +67,8 @@ class InvalidAuthenticationMethod(DatabaseException):
 class InvalidLogin(DatabaseException):
     """Raise when user login invalid."""
     _code: int = 1002
+
+
+class UserAlreadyExists(DatabaseException):
+    """Raise when registering email which has been used."""
+    _code: int = 1004
@@ -0,0 +1,155 @@
+"""
+Statement counting and connection pool statistics of database engines.
+
+Every statement executed is recorded into process totals and into the
+statistics collected by the current context, a request for example, so
+the number of statements, time spent on database and repeated statement
+shapes (N+1 queries) can be reported per request.
+"""
+from backend.src import metrics
+
+import typing as t
+import time
+import logging
+import contextlib
+import contextvars
+from collections import Counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Statements executed and time spent on them, in seconds."""
+
+    def __init__(self, parent: "QueryStats | None" = None, shapes: bool = True) -> None:
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        # Statements are compiled with placeholders, so text is the shape
+        self.shapes: t.Counter[str] | None = Counter() if shapes else None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.shapes is not None:
+            self.shapes[statement] += 1
+        if self.parent is not None:
+            self.parent.record(statement, duration)
+
+    def repeated(self, threshold: int) -> t.List[t.Tuple[str, int]]:
+        """Shapes executed at least threshold times, most repeated first."""
+        if self.shapes is None:
+            return []
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+totals = QueryStats(shapes=False)
+_current: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextlib.contextmanager
+def collect() -> t.Iterator[QueryStats]:
+    """Collect statements executed within the context.
+
+    Contexts could be nested, statements are recorded into outer ones too.
+    """
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._query_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    duration = time.perf_counter() - context._query_started
+    totals.record(statement, duration)
+    metrics.DB_STATEMENTS.inc()
+    metrics.DB_STATEMENT_DURATION.inc(duration)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Record statements executed on engine."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_execute)
+
+
+class PoolStats(t.NamedTuple):
+    """Utilization of connection pool and time waited for connections."""
+    size: int
+    max_overflow: int
+    checked_out: int
+    acquired: int
+    timeouts: int
+    wait: float
+    wait_max: float
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool measuring how long checkouts wait for a connection."""
+
+    def __init__(self, *args: t.Any, **kwargs: t.Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait = 0.0
+        self.wait_max = 0.0
+        metrics.DB_POOL_CAPACITY.inc(self.size() + max(self._max_overflow, 0))
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        metrics.DB_POOL_CAPACITY.dec(self.size() + max(self._max_overflow, 0))
+        return super().recreate()  # type: ignore
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            metrics.DB_POOL_TIMEOUTS.inc()
+            raise
+        wait = time.perf_counter() - start
+        self.acquired += 1
+        self.wait += wait
+        self.wait_max = max(self.wait_max, wait)
+        metrics.DB_POOL_WAIT.observe(wait)
+        metrics.DB_POOL_CHECKED_OUT.inc()
+        return entry
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        metrics.DB_POOL_CHECKED_OUT.dec()
+        super()._do_return_conn(record)  # type: ignore
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            size=self.size(),
+            max_overflow=self._max_overflow,
+            checked_out=self.checkedout(),
+            acquired=self.acquired,
+            timeouts=self.timeouts,
+            wait=self.wait,
+            wait_max=self.wait_max
+        )
+
+
+def pool_stats(engine: AsyncEngine) -> PoolStats | None:
+    """Statistics of engine pool, None if pool is not instrumented."""
+    pool = engine.sync_engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedQueuePool) else None
@@ -0,0 +1,95 @@
+"""
+Password hashing off the event loop.
+
+Bcrypt costs hundreds of milliseconds of CPU per call, so hashing and
+verification run on a bounded pool of threads or processes. Calls beyond
+the queue limit are rejected at once instead of piling up.
+"""
+from backend.src import metrics
+from backend.src.config import settings
+from backend.src.resources import registry
+from backend.src.database import DatabaseException
+
+import typing as t
+import time
+import asyncio
+import concurrent.futures as futures
+
+from passlib.context import CryptContext
+
+
+PasswordContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasherBusy(DatabaseException):
+    """Raise when too many password hashing calls are waiting."""
+    _code: int = 1003
+
+
+def _hash(plain_password: str) -> t.Tuple[str, float]:
+    start = time.perf_counter()
+    return PasswordContext.hash(plain_password), time.perf_counter() - start
+
+
+def _verify(plain_password: str, hashed_password: str) -> t.Tuple[bool, float]:
+    start = time.perf_counter()
+    return (
+        PasswordContext.verify(plain_password, hashed_password),
+        time.perf_counter() - start
+    )
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded executor."""
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        queue_limit: int = settings.PASSWORD_HASH_QUEUE_LIMIT,
+        executor: t.Literal["thread", "process"] = settings.PASSWORD_HASH_EXECUTOR
+    ) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor: futures.Executor = (
+            futures.ProcessPoolExecutor(workers) if executor == "process"
+            else futures.ThreadPoolExecutor(workers, thread_name_prefix="password")
+        )
+        self._pending = 0
+
+    def __len__(self) -> int:
+        """Number of calls running or waiting."""
+        return self._pending
+
+    async def _submit(self, func: t.Callable[..., t.Tuple[t.Any, float]], *args: str) -> t.Any:
+        if self._pending >= self.workers + self.queue_limit:
+            metrics.PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy("too many password hashing calls waiting")
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            result, hash_time = await asyncio.wrap_future(
+                self.executor.submit(func, *args)
+            )
+        finally:
+            self._pending -= 1
+        # Time not spent on hashing was spent waiting for a free worker
+        queue_wait = time.perf_counter() - start - hash_time
+        metrics.PASSWORD_HASH_QUEUE_WAIT.observe(queue_wait)
+        metrics.PASSWORD_HASH_DURATION.observe(hash_time)
+        return result
+
+    async def hash(self, plain_password: str) -> str:
+        """Hash password with salt using hash algorithm."""
+        return await self._submit(_hash, plain_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Validate password with salt using hash algorithm."""
+        return await self._submit(_verify, plain_password, hashed_password)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hasher() -> PasswordHasher:
+    """Get password hasher shared by the process."""
+    return registry.get("PASSWORD_HASHER", PasswordHasher, closer=PasswordHasher.close)
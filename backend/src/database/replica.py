@@ -0,0 +1,169 @@
+"""
+Routing of read-only sessions to database replicas.
+
+Replicas are picked round-robin among the healthy ones and checked in
+background. Users who have just written are pinned to the primary for a
+while, so they read their own writes despite replication lag.
+"""
+from backend.src import cache
+from backend.src.config import settings
+from backend.src.resources import registry
+from backend.src.database import engine, engine_options
+from backend.src.database.instrument import instrument
+
+import typing as t
+import asyncio
+import logging
+import itertools
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(uri: str) -> AsyncEngine:
+    replica = create_async_engine(uri, **engine_options(uri))
+    instrument(replica)
+    return replica
+
+
+class ReplicaRouter:
+    """Pick engines for read-only sessions."""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: t.Sequence[AsyncEngine],
+        interval: float = settings.DB_REPLICA_CHECK_INTERVAL,
+        max_lag: float = settings.DB_REPLICA_MAX_LAG,
+        pin: float = settings.DB_REPLICA_PIN_SECONDS
+    ) -> None:
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.interval = interval
+        self.max_lag = max_lag
+        self.healthy: t.Set[AsyncEngine] = set(self.replicas)
+        self.pins: cache.TTLCache[str, bool] = cache.TTLCache(
+            maxsize=settings.USER_CACHE_SIZE, ttl=pin
+        )
+        self._cycle = itertools.cycle(self.replicas)
+        self._checker: asyncio.Task | None = None
+
+    def choose(self) -> AsyncEngine:
+        """Next healthy replica, primary when there is none."""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica in self.healthy:
+                return replica
+        return self.primary
+
+    @staticmethod
+    def _pin_key(subject: str) -> str:
+        return f"db:pin:{subject}"
+
+    async def _publish_pin(self, subject: str) -> None:
+        try:
+            await settings.AIOREDIS.set(
+                self._pin_key(subject), 1, px=int(self.pins.ttl * 1000)
+            )
+        except Exception as error:
+            logger.warning(f"failed to pin {subject} to primary: {error}")
+
+    def pin(self, subject: str) -> None:
+        """Route reads of subject to primary for a while, in every process."""
+        if not self.replicas:
+            return
+        self.pins.set(subject, True)
+        try:
+            asyncio.get_running_loop().create_task(self._publish_pin(subject))
+        except RuntimeError:
+            pass
+
+    async def route(self, subject: str | None = None) -> AsyncEngine:
+        """Engine for reads of subject, primary if subject has just written."""
+        if not self.replicas:
+            return self.primary
+        if subject is None:
+            return self.choose()
+        if self.pins.get(subject):
+            return self.primary
+        try:
+            pinned = await settings.AIOREDIS.exists(self._pin_key(subject))
+        except Exception as error:
+            # Pins of other processes are unknown, reading own writes wins
+            logger.warning(f"failed to read pin of {subject}: {error}")
+            return self.primary
+        return self.primary if pinned else self.choose()
+
+    async def _check(self, replica: AsyncEngine) -> None:
+        async with replica.connect() as conn:
+            if replica.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return
+            lag = (await conn.execute(text(
+                "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            ))).scalar()
+            if lag is not None and lag > self.max_lag:
+                raise RuntimeError(f"replication lag {lag:.1f}s")
+
+    async def check(self) -> None:
+        """Check all replicas concurrently and update healthy ones."""
+        results = await asyncio.gather(*(
+            asyncio.wait_for(self._check(replica), settings.HEALTH_CHECK_TIMEOUT)
+            for replica in self.replicas
+        ), return_exceptions=True)
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, BaseException):
+                if replica in self.healthy:
+                    logger.warning(f"replica {replica.url!r} unhealthy: {result!r}")
+                self.healthy.discard(replica)
+            else:
+                self.healthy.add(replica)
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start background checks of replicas."""
+        if self.replicas and (self._checker is None or self._checker.done()):
+            self._checker = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.dispose()
+
+
+def router() -> ReplicaRouter:
+    """Get router of replicas configured."""
+    return registry.get("DATABASE_REPLICAS", lambda: ReplicaRouter(
+        engine, [_create_engine(uri) for uri in settings.DATABASE_REPLICA_URIS]
+    ), closer=ReplicaRouter.close)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_written(session: Session, *_) -> None:
+    session.info["written"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session: Session) -> None:
+    """Pin subject of session to primary once it has committed writes."""
+    subject = session.info.get("subject")
+    if session.info.pop("written", False) and subject is not None:
+        router().pin(subject)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_written(session: Session, *_) -> None:
+    session.info.pop("written", None)
@@ -1,14 +1,19 @@
+import typing as t
 import typing_extensions as te
 import uuid
 import enum
 from datetime import datetime, timezone
 
 from backend.src.config import settings
+from backend.src.tasks.results import (
+    TaskState,
+    fetch_state,
+    fetch_states
+)
 
-from sqlmodel import SQLModel, Field, Column
+from sqlmodel import SQLModel, Field, Column, select
 from sqlmodel import Enum as SqlEnum
 from sqlmodel.ext.asyncio.session import AsyncSession
-from celery.result import AsyncResult
 
 
 @enum.unique
@@ -62,22 +67,60 @@ class Task(SQLModel, table=True):
         """Query a task by its ID."""
         return await session.get(cls, uuid.UUID(id))
 
+    @classmethod
+    async def query_many(cls, session: AsyncSession, ids: t.Iterable[str], *, owner_id: uuid.UUID | None = None) -> t.List[te.Self]:
+        """Query tasks by their IDs with one statement, optionally only owned ones."""
+        query = select(cls).where(
+            cls.id.in_([uuid.UUID(id) for id in ids])  # type: ignore
+        )
+        if owner_id is not None:
+            query = query.where(cls.owner_id == owner_id)
+        return list((await session.exec(query)).all())
+
+    def _track(self, result: TaskState) -> bool:
+        """Apply Celery task result and update timestamp, return if changed."""
+        status = TaskStatus(result.state.lower())
+        if status == self.status:
+            return False
+        self.status = status
+        self.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        if self.status == TaskStatus.SUCCESS:
+            self.celery_task_result = str(result.result)
+        return True
+
     async def update(self, session: AsyncSession) -> te.Self:
         """Update the task."""
         # Once the task is already failed or success or revoked, we can stop tracking it
         if self.status in TaskStatusFinal:
             return self
 
-        # Track Celery task result and update timestamp
-        result = AsyncResult(self.celery_task_id, app=settings.CELERY)
-        if result.state != self.status:
-            self.status = TaskStatus(result.state.lower())
-            self.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
-            if self.status == TaskStatus.SUCCESS:
-                self.celery_task_result = str(result.get())
+        # Workers push status into database by themselves
+        if settings.TASK_STATUS_PUSH:
+            return self
 
-            # Commit changes if there are any updates
+        # Commit changes if there are any updates
+        if self._track(await fetch_state(self.celery_task_id)):
             session.add(self)
             await session.commit()
             await session.refresh(self)
         return self
+
+    @classmethod
+    async def update_many(cls, session: AsyncSession, tasks: t.List[te.Self]) -> t.List[te.Self]:
+        """Update tasks with one result backend round trip and one commit."""
+        tracking = [task for task in tasks if task.status not in TaskStatusFinal]
+        if not tracking or settings.TASK_STATUS_PUSH:
+            return tasks
+
+        results = await fetch_states([task.celery_task_id for task in tracking])
+        changed = [
+            task for task, result in zip(tracking, results) if task._track(result)
+        ]
+        if changed:
+            ids = [str(task.id) for task in tasks]
+            session.add_all(changed)
+            await session.commit()
+
+            # Reload expired tasks with one statement instead of refreshing each
+            await cls.query_many(session, ids)
+        return tasks
@@ -0,0 +1,104 @@
+"""
+Stores of refresh tokens.
+
+Redis store keeps tokens by their hash with native expiry, so a refresh is
+one GET. SQL store keeps tokens in the RefreshToken table, one per user.
+"""
+from backend.src.config import settings
+from backend.src.database.user import User, RefreshToken
+
+import typing as t
+import abc
+import uuid
+import hashlib
+import secrets
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+class RefreshTokenStore(abc.ABC):
+    """Base class of refresh token stores."""
+
+    @abc.abstractmethod
+    async def issue(self, session: AsyncSession, user: User) -> str:
+        """Issue a new refresh token for the user."""
+
+    @abc.abstractmethod
+    async def lookup(self, session: AsyncSession, content: str) -> uuid.UUID | None:
+        """Get id of user the token was issued to, None if invalid or expired."""
+
+    @abc.abstractmethod
+    async def revoke(self, session: AsyncSession, user: User) -> None:
+        """Revoke all refresh tokens of the user."""
+
+
+class SQLRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens in database, issuing replaces token of the user."""
+
+    async def issue(self, session: AsyncSession, user: User) -> str:
+        token = await RefreshToken.create(session, user=user)
+        return token.content
+
+    async def lookup(self, session: AsyncSession, content: str) -> uuid.UUID | None:
+        token = await RefreshToken.query(session, content=content)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if token is None or token.valid_before <= now:
+            return None
+        return token.user_id
+
+    async def revoke(self, session: AsyncSession, user: User) -> None:
+        token = await RefreshToken.query(session, user=user)
+        if token:
+            await token.delete(session)
+
+
+class RedisRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens in Redis keyed by their hash, each login gets its own."""
+
+    @staticmethod
+    def _key(content: str) -> str:
+        return f"refresh:{hashlib.sha256(content.encode()).hexdigest()}"
+
+    @staticmethod
+    def _user_key(user_id: uuid.UUID) -> str:
+        return f"refresh:user:{user_id}"
+
+    @staticmethod
+    def _user_id(user: User) -> uuid.UUID:
+        # Identity is kept after commit expires the user, reading it never loads
+        identity = inspect(user).identity
+        return identity[0] if identity else user.id
+
+    async def issue(self, session: AsyncSession, user: User) -> str:
+        user_id = self._user_id(user)
+        content = secrets.token_hex(32)
+        ttl = settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
+        async with settings.AIOREDIS.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(content), str(user_id), ex=ttl)
+            # Index of tokens for logout, it lives as long as the newest token
+            pipe.sadd(self._user_key(user_id), self._key(content))
+            pipe.expire(self._user_key(user_id), ttl)
+            await pipe.execute()
+        return content
+
+    async def lookup(self, session: AsyncSession, content: str) -> uuid.UUID | None:
+        user_id = await settings.AIOREDIS.get(self._key(content))
+        return uuid.UUID(user_id.decode()) if user_id else None
+
+    async def revoke(self, session: AsyncSession, user: User) -> None:
+        user_key = self._user_key(self._user_id(user))
+        keys = await settings.AIOREDIS.smembers(user_key)
+        await settings.AIOREDIS.delete(user_key, *keys)
+
+
+stores: t.Dict[str, RefreshTokenStore] = {
+    "sql": SQLRefreshTokenStore(),
+    "redis": RedisRefreshTokenStore(),
+}
+
+
+def refresh_tokens() -> RefreshTokenStore:
+    """Get refresh token store configured."""
+    return stores[settings.REFRESH_TOKEN_STORE]
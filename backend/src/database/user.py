@@ -1,8 +1,11 @@
 from backend.src import settings
+from backend.src import cache
 from backend.src.database import (
     InvalidAuthenticationMethod,
-    InvalidLogin
+    InvalidLogin,
+    UserAlreadyExists
 )
+from backend.src.database.password import hasher
 
 import typing as t
 import typing_extensions as te
@@ -11,12 +14,32 @@ from datetime import datetime, timezone, timedelta
 import secrets
 
 from pydantic import EmailStr
+from sqlalchemy import event, inspect, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, contains_eager, make_transient_to_detached
 from sqlmodel import SQLModel, Field, Relationship, select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from passlib.context import CryptContext
 
 
-PasswordContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _membership_version_key(user_id: uuid.UUID | str) -> str:
+    return f"user:{user_id}:groups:version"
+
+
+async def membership_version(user_id: uuid.UUID | str) -> int:
+    """Get version of group membership of the user, 0 if never changed."""
+    version = await settings.AIOREDIS.get(_membership_version_key(user_id))
+    return int(version or 0)
+
+
+async def bump_membership_version(*user_ids: uuid.UUID | str) -> None:
+    """Mark group claims issued to users before now as stale."""
+    if not user_ids:
+        return
+    # Keys never expire, a reset version would make stale claims valid again
+    async with settings.AIOREDIS.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.incr(_membership_version_key(user_id))
+        await pipe.execute()
 
 
 class UserGroup(SQLModel, table=True):
@@ -60,8 +83,11 @@ class Group(SQLModel, table=True):
 
     async def delete(self, session: AsyncSession) -> None:
         """Delete the group."""
+        await session.refresh(self, attribute_names=["users"])
+        user_ids = [inspect(user).identity[0] for user in self.users]
         await session.delete(self)
         await session.commit()
+        await bump_membership_version(*user_ids)
 
     @classmethod
     async def list(cls, session: AsyncSession) -> t.List[te.Self]:
@@ -81,13 +107,25 @@ class Group(SQLModel, table=True):
             return group.first() if group else None
         return None
 
+    @classmethod
+    async def list_names(cls, session: AsyncSession, *, user_id: uuid.UUID | str) -> t.List[str]:
+        """List names of groups the user belongs to."""
+        names = await session.exec(
+            select(cls.name).join(UserGroup).where(
+                UserGroup.user_id == uuid.UUID(str(user_id))
+            )
+        )
+        return list(names.all())
+
     async def add_user(self, session: AsyncSession, *, user: "User") -> None:
         """Add a user to the group."""
         await session.refresh(self, attribute_names=["users"])
         if user not in self.users:
             self.users.append(user)
             session.add(self)
+            user_id = inspect(user).identity[0]
             await session.commit()
+            await bump_membership_version(user_id)
             await session.refresh(self, attribute_names=["users"])
 
     async def remove_user(self, session: AsyncSession, *, user: "User") -> None:
@@ -96,7 +134,9 @@ class Group(SQLModel, table=True):
         if user in self.users:
             self.users.remove(user)
             session.add(self)
+            user_id = inspect(user).identity[0]
             await session.commit()
+            await bump_membership_version(user_id)
             await session.refresh(self)
             await session.refresh(self, attribute_names=["users"])
 
@@ -134,7 +174,7 @@ class PasswordAuthentication(Authentication, table=True):
     @classmethod
     async def create(cls, session: AsyncSession, *, user: "User", password: str) -> te.Self:
         """Create a new password authentication."""
-        hashed_password = cls._hash_password(plain_password=password)
+        hashed_password = await hasher().hash(password)
         auth = cls(user_id=user.id, email=user.email,
                    hashed_password=hashed_password)
         session.add(auth)
@@ -147,7 +187,7 @@ class PasswordAuthentication(Authentication, table=True):
     async def reset_password(self, session: AsyncSession, *, password: str) -> None:
         """Reset password."""
         await session.refresh(self)
-        self.hashed_password = self._hash_password(plain_password=password)
+        self.hashed_password = await hasher().hash(password)
         session.add(self)
         await session.commit()
         await session.refresh(self)
@@ -163,28 +203,26 @@ class PasswordAuthentication(Authentication, table=True):
 
     @classmethod
     async def authenticate(cls, session: AsyncSession, *, email: str, password: str) -> "User":
-        """Authenticate user by email and password."""
-        auth = await cls.query(session, email=email)
-        if auth is None:
+        """Authenticate user by email and password.
+
+        Groups of returned user are loaded by the same query.
+        """
+        rows = (await session.exec(
+            select(User, cls.hashed_password).join(
+                cls, cls.user_id == User.id  # type: ignore
+            ).outerjoin(UserGroup).outerjoin(Group).options(
+                contains_eager(User.groups)  # type: ignore
+            ).where(cls.email == email)
+        )).unique().all()
+        if not rows:
             raise InvalidLogin("invalid email or password")
-        if not auth._validate_plain_password(plain_password=password):
+        user, hashed_password = rows[0]
+        if not await hasher().verify(password, hashed_password):
             raise InvalidLogin("invalid email or password")
-        user = await User.query(session, id=str(auth.user_id))
-        if user is None:
-            raise InvalidLogin("internal error - unmatched login method")
         if user.is_disabled or user.is_deleted:
             raise InvalidLogin("user account is disabled or deleted")
         return user
 
-    def _validate_plain_password(self, *, plain_password: str) -> bool:
-        """Validate password with salt using hash algorithm."""
-        return PasswordContext.verify(plain_password, self.hashed_password)
-
-    @staticmethod
-    def _hash_password(*, plain_password: str) -> str:
-        """Hash password with salt using hash algorithm."""
-        return PasswordContext.hash(plain_password)
-
 
 class User(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -220,6 +258,35 @@ class User(SQLModel, table=True):
         await session.refresh(user)
         return user
 
+    @classmethod
+    async def register(cls, session: AsyncSession, *, email: str, password: str, **extra_fields: t.Any) -> te.Self:
+        """Create a new user with password authentication in one transaction.
+
+        Returned user is detached and built from the inserted row.
+        """
+        hashed_password = await hasher().hash(password)
+        user = cls(
+            email=email,
+            auth_methods_bitmask=1 << PasswordAuthentication.bitmask,
+            **extra_fields
+        )
+        try:
+            row = (await session.exec(
+                insert(cls).values(**user.model_dump()).returning(
+                    *cls.__table__.columns  # type: ignore
+                )
+            )).one()
+            await session.exec(insert(PasswordAuthentication).values(
+                user_id=row.id, email=email, hashed_password=hashed_password
+            ))
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise UserAlreadyExists(f"email {email} has been registered")
+        user = cls(**row._mapping)
+        make_transient_to_detached(user)
+        return user
+
     async def delete(self, session: AsyncSession) -> None:
         """Soft delete the user by setting is_deleted to True and updating time_deleted."""
         self.is_deleted = True
@@ -267,7 +334,8 @@ class User(SQLModel, table=True):
 class RefreshToken(SQLModel, table=True):
     user_id: uuid.UUID = Field(
         nullable=False, foreign_key="user.id", primary_key=True)
-    content: str = Field(nullable=False, primary_key=True)
+    # Tokens are looked up by content alone, which is not leading in key
+    content: str = Field(nullable=False, primary_key=True, index=True)
 
     time_created: datetime = Field(
         default_factory=lambda: datetime.now(
@@ -298,20 +366,20 @@ class RefreshToken(SQLModel, table=True):
 
     @classmethod
     async def create(cls, session: AsyncSession, *, user: User) -> te.Self:
-        """Create or update refresh token for corresponded user."""
-        token = await cls.query(session, user=user)
-        if token:
-            token.content = secrets.token_hex(32)
-            token.time_created = datetime.now(
-                timezone.utc).replace(tzinfo=None)
-            token.valid_before = token.time_created + timedelta(
-                minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+        """Replace refresh token of corresponded user in one transaction.
+
+        Returned token is detached and built from the inserted row.
+        """
+        token = cls(user_id=inspect(user).identity[0], content=secrets.token_hex(32))
+        await session.exec(delete(cls).where(cls.user_id == token.user_id))  # type: ignore
+        row = (await session.exec(
+            insert(cls).values(**token.model_dump()).returning(
+                *cls.__table__.columns  # type: ignore
             )
-        else:
-            await session.refresh(user)
-            token = cls(user_id=user.id, content=secrets.token_hex(32))
-        session.add(token)
+        )).one()
         await session.commit()
+        token = cls(**row._mapping)
+        make_transient_to_detached(token)
         return token
 
     async def delete(self, session: AsyncSession) -> None:
@@ -319,3 +387,38 @@ class RefreshToken(SQLModel, table=True):
         await session.delete(self)
         await session.flush()
         await session.commit()
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_users(session: Session, *_) -> None:
+    """Collect users whose cached state become stale by this flush."""
+    users: t.Set[str] = session.info.setdefault("changed_users", set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            users.add(str(obj.id))
+        elif isinstance(obj, Group):
+            history = inspect(obj).attrs.users.history
+            users.update(
+                str(user.id) for user in (*history.added, *history.deleted)
+            )
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            users.add(str(obj.id))
+        elif isinstance(obj, Group):
+            # Members of deleted group may not be loaded
+            session.info["changed_all_users"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    users = session.info.pop("changed_users", set())
+    if session.info.pop("changed_all_users", False):
+        cache.invalidate("user")
+    elif users:
+        cache.invalidate("user", *users)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_users(session: Session, *_) -> None:
+    session.info.pop("changed_users", None)
+    session.info.pop("changed_all_users", None)
@@ -23,6 +23,11 @@ class AuthenticationException(IntegrationException):
     _code: int = 1001
 
 
+class InvalidTokenException(AuthenticationException):
+    """Exception raised when Moodle rejects token."""
+    _code: int = 1003
+
+
 class UnSynchronizedSiteInfo(IntegrationException):
     """Exception when API calling without syncornized siteinfo."""
     _code: int = 1002
@@ -1,12 +1,17 @@
 import aiohttp
 from pydantic import BaseModel, TypeAdapter
 
+from backend.src import metrics
 from backend.src.integration import (
     logger,
     AuthenticationException,
+    InvalidTokenException,
     APICallingException,
     UnSynchronizedSiteInfo
 )
+from backend.src.integration import http
+from backend.src.integration.credentials import credentials
+from backend.src.integration.responses import responses
 from backend.src.integration.models import (
     Course,
     Assignment,
@@ -15,6 +20,8 @@ from backend.src.integration.models import (
 
 import typing as t
 import typing_extensions as te
+import time
+import asyncio
 
 
 class MoodleConfig(BaseModel):
@@ -23,6 +30,8 @@ class MoodleConfig(BaseModel):
     password: str
     base_url: str
     service: t.Literal["moodle_mobile_app", ""]
+    # Ids sent within one request of batch calls, bounds URL length
+    batch_size: int = 50
 
 
 class AuthenticationForm(BaseModel):
@@ -47,22 +56,63 @@ class Token(BaseModel):
     error: t.Optional[str] | None = None
 
 
+def chunks(ids: t.Iterable[int], size: int) -> t.List[t.List[int]]:
+    """Split ids into lists of at most `size`, duplicates are dropped."""
+    unique = list(dict.fromkeys(ids))
+    return [unique[i:i + size] for i in range(0, len(unique), size)]
+
+
 class APIClient:
 
-    def __init__(self, config: MoodleConfig) -> None:
+    def __init__(self, config: MoodleConfig, session: aiohttp.ClientSession | None = None) -> None:
         self.config = config
         self.token: t.Optional[str] = None
         self.site: t.Optional[SiteInfo] = None
-        self.session: aiohttp.ClientSession = aiohttp.ClientSession()
+        self._session = session
+        self._renewing = asyncio.Lock()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Session given to client, shared one of current loop by default."""
+        return self._session or http.session()
 
     async def __aenter__(self) -> te.Self:
         """Prepare an authenticated client for using."""
-        await self.authenticate()
-        await self.sync_site_info()
+        await self.connect()
         return self
 
     async def __aexit__(self, *_) -> None:
-        await self.session.close()
+        # Sessions are shared, they are closed by their owner
+        pass
+
+    @property
+    def _credentials_key(self) -> str:
+        return credentials.key(
+            self.config.base_url, self.config.username,
+            self.config.service, self.config.password
+        )
+
+    async def connect(self, renew: bool = False) -> None:
+        """Restore token and site info from cache, authenticate on miss.
+
+        Cached values are dropped first when renewing a rejected token.
+        """
+        key = self._credentials_key
+        if renew:
+            await credentials.invalidate(key)
+        else:
+            cached = await credentials.get(key)
+            if cached is not None:
+                self.token = cached["token"]
+                self.site = SiteInfo(**cached["site"])
+                return
+        await self.authenticate()
+        # Not retried, a fresh token being rejected is not recoverable
+        self.site = SiteInfo(**await self._call("core_webservice_get_site_info"))
+        await credentials.set(key, {
+            "token": self.token,
+            "site": self.site.model_dump()
+        })
 
     async def authenticate(self) -> str:
         """Authenticate with Moodle and obtain a token."""
@@ -97,37 +147,75 @@ class APIClient:
         return site_info
 
     async def _make_request(self, endpoint: str, params: t.Dict[str, t.Any] | None = None) -> t.Any:
-        """Make an authenticated request to the Moodle API."""
+        """Make an authenticated request to the Moodle API.
+
+        Responses of read-only functions are cached per credentials, so
+        they are never served to clients with other ones, see
+        `MOODLE_RESPONSE_TTL`.
+        """
+        if responses.ttl(endpoint) is None:
+            return await self._request(endpoint, params)
+        return await responses.fetch(
+            responses.key(self._credentials_key, endpoint, params),
+            endpoint, lambda: self._request(endpoint, params)
+        )
+
+    async def _request(self, endpoint: str, params: t.Dict[str, t.Any] | None = None) -> t.Any:
+        """Token rejected by Moodle is renewed once and request is retried."""
+        token = self.token
+        try:
+            return await self._call(endpoint, params)
+        except InvalidTokenException:
+            async with self._renewing:
+                # Concurrent requests share one renewal
+                if self.token == token:
+                    await self.connect(renew=True)
+            return await self._call(endpoint, params)
+
+    async def _call(self, endpoint: str, params: t.Dict[str, t.Any] | None = None) -> t.Any:
         if not self.token:
             raise AuthenticationException("not authenticated")
         api_url = f"{self.config.base_url}/webservice/rest/server.php"
 
-        if params is None:
-            params = {}
-        params.update({
+        params = {
+            **(params or {}),
             "wstoken": self.token,
             "moodlewsrestformat": "json",
             "wsfunction": endpoint
-        })
+        }
 
-        async with self.session.get(api_url, params=params) as resp:
-            if resp.status == 401 or resp.status == 403:
-                logger.error("authentication token is invalid or expired")
-                raise AuthenticationException(
-                    "authentication token is invalid or expired")
-            if resp.status != 200:
-                logger.error(
-                    f"API request to {endpoint} failed with status code {resp.status}")
-                raise APICallingException(
-                    f"API request to {endpoint} failed")
-            try:
-                data = await resp.json()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self.session.get(api_url, params=params) as resp:
+                if resp.status == 401 or resp.status == 403:
+                    logger.error("authentication token is invalid or expired")
+                    raise InvalidTokenException(
+                        "authentication token is invalid or expired")
+                if resp.status != 200:
+                    logger.error(
+                        f"API request to {endpoint} failed with status code {resp.status}")
+                    raise APICallingException(
+                        f"API request to {endpoint} failed")
+                try:
+                    data = await resp.json()
+                except aiohttp.ContentTypeError as e:
+                    logger.error(
+                        f"failed to parse JSON response from {endpoint}: {e}")
+                    raise APICallingException(
+                        f"failed to parse JSON response from {endpoint}") from e
+                # Moodle reports errors with status 200
+                if isinstance(data, dict) and data.get("errorcode") == "invalidtoken":
+                    logger.error("authentication token is invalid or expired")
+                    raise InvalidTokenException(
+                        "authentication token is invalid or expired")
+                outcome = "ok"
                 return data
-            except aiohttp.ContentTypeError as e:
-                logger.error(
-                    f"failed to parse JSON response from {endpoint}: {e}")
-                raise APICallingException(
-                    f"failed to parse JSON response from {endpoint}") from e
+        finally:
+            metrics.MOODLE_REQUESTS.labels(endpoint, outcome).inc()
+            metrics.MOODLE_REQUEST_DURATION.labels(endpoint).observe(
+                time.perf_counter() - start
+            )
 
     async def get_courses(self) -> t.List[Course]:
         """Get all courses for current user."""
@@ -140,22 +228,57 @@ class APIClient:
         )
         return TypeAdapter(t.List[Course]).validate_python(response)
 
+    @staticmethod
+    def _indexed(name: str, ids: t.List[int]) -> t.Dict[str, int]:
+        """Encode ids as Moodle array parameters, `name[0]=id0&name[1]=id1`."""
+        return {f"{name}[{index}]": id for index, id in enumerate(ids)}
+
+    async def get_courses_assignments(self, course_ids: t.Iterable[int]) -> t.Dict[int, t.List[Assignment]]:
+        """Get assignments of given courses grouped by course id.
+
+        Ids are fetched in chunks of `batch_size` concurrently, courses
+        not visible to current user are mapped to empty lists.
+        """
+        batches = chunks(course_ids, self.config.batch_size)
+        pages = await asyncio.gather(*(
+            self._make_request(
+                endpoint="mod_assign_get_assignments",
+                params=self._indexed("courseids", chunk)
+            ) for chunk in batches
+        ))
+        grouped: t.Dict[int, t.List[Assignment]] = {
+            id: [] for chunk in batches for id in chunk
+        }
+        for page in pages:
+            for course in page["courses"]:
+                grouped[course["id"]] = TypeAdapter(t.List[Assignment]).validate_python(
+                    course["assignments"]
+                )
+        return grouped
+
+    async def get_assignments_submissions(self, assignment_ids: t.Iterable[int]) -> t.Dict[int, t.List[Submission]]:
+        """Get submissions of given assignments grouped by assignment id."""
+        batches = chunks(assignment_ids, self.config.batch_size)
+        pages = await asyncio.gather(*(
+            self._make_request(
+                endpoint="mod_assign_get_submissions",
+                params=self._indexed("assignmentids", chunk)
+            ) for chunk in batches
+        ))
+        grouped: t.Dict[int, t.List[Submission]] = {
+            id: [] for chunk in batches for id in chunk
+        }
+        for page in pages:
+            for assignment in page["assignments"]:
+                grouped[assignment["assignmentid"]] = TypeAdapter(t.List[Submission]).validate_python(
+                    assignment["submissions"]
+                )
+        return grouped
+
     async def get_course_assignments(self, course_id: int) -> t.List[Assignment]:
         """Get all assignment info for given course."""
-        response = await self._make_request(
-            endpoint="mod_assign_get_assignments",
-            params={"courseids[0]": [course_id]}
-        )
-        return TypeAdapter(t.List[Assignment]).validate_python(
-            response["courses"][0]["assignments"]
-        )
+        return (await self.get_courses_assignments([course_id]))[course_id]
 
     async def get_assignment_submissions(self, assignment_id: int) -> t.List[Submission]:
         """Get all submissions for given course."""
-        response = await self._make_request(
-            endpoint="mod_assign_get_submissions",
-            params={"assignmentids[0]": assignment_id}
-        )
-        return TypeAdapter(t.List[Submission]).validate_python(
-            response["assignments"][0]["submissions"]
-        )
+        return (await self.get_assignments_submissions([assignment_id]))[assignment_id]
@@ -0,0 +1,96 @@
+"""
+Moodle tokens and site info shared by API and worker processes.
+
+Entries are keyed by digest of (base_url, username, service) and of an
+HMAC of the password, so they are only reused with the same credentials.
+They are stored in Redis encrypted with a key derived from SECRET_KEY,
+with an in-process cache in front. Invalidating an entry evicts it from every process.
+"""
+from backend.src import cache
+from backend.src.config import settings
+from backend.src.integration import logger
+
+import typing as t
+import hmac
+import json
+import base64
+import hashlib
+
+from cryptography.fernet import Fernet, InvalidToken
+
+
+class CredentialCache:
+    """Encrypted two-level cache of Moodle credentials."""
+
+    namespace = "moodle_credentials"
+
+    def __init__(
+        self,
+        secret: str = settings.SECRET_KEY,
+        ttl: int = settings.MOODLE_TOKEN_TTL,
+        local_ttl: float = settings.MOODLE_TOKEN_LOCAL_TTL
+    ) -> None:
+        self.secret = secret.encode()
+        self.fernet = Fernet(base64.urlsafe_b64encode(
+            hashlib.sha256(secret.encode()).digest()
+        ))
+        self.ttl = ttl
+        self.local: cache.TTLCache[str, t.Dict[str, t.Any]] = cache.TTLCache(
+            maxsize=settings.MOODLE_TOKEN_CACHE_SIZE, ttl=local_ttl
+        )
+        cache.register(self.namespace, self.local)
+
+    def key(self, base_url: str, username: str, service: str, password: str) -> str:
+        """Digest of account and keyed digest of its password.
+
+        Entries are only found with the same credentials they were cached
+        with, and usernames are not exposed in Redis keys.
+        """
+        proof = hmac.new(self.secret, password.encode(), hashlib.sha256).hexdigest()
+        return hashlib.sha256(
+            "\0".join((base_url, username, service, proof)).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"moodle:credentials:{key}"
+
+    async def get(self, key: str) -> t.Dict[str, t.Any] | None:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        try:
+            encrypted = await settings.AIOREDIS.get(self._redis_key(key))
+        except Exception as error:
+            logger.warning(f"failed to read cached Moodle credentials: {error}")
+            return None
+        if encrypted is None:
+            return None
+        try:
+            value = json.loads(self.fernet.decrypt(encrypted))
+        except InvalidToken:
+            # Written with another secret key, treat as missing
+            return None
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: t.Dict[str, t.Any]) -> None:
+        self.local.set(key, value)
+        try:
+            await settings.AIOREDIS.set(
+                self._redis_key(key),
+                self.fernet.encrypt(json.dumps(value).encode()),
+                ex=self.ttl
+            )
+        except Exception as error:
+            logger.warning(f"failed to cache Moodle credentials: {error}")
+
+    async def invalidate(self, key: str) -> None:
+        try:
+            await settings.AIOREDIS.delete(self._redis_key(key))
+        except Exception as error:
+            logger.warning(f"failed to drop cached Moodle credentials: {error}")
+        cache.invalidate(self.namespace, key)
+
+
+credentials = CredentialCache()
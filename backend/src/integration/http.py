@@ -0,0 +1,65 @@
+"""
+Shared HTTP session of Moodle clients.
+
+One session is kept per event loop, so connections, TLS sessions and DNS
+lookups are reused across all `APIClient` instances. It is closed with
+other resources when application shuts down.
+"""
+from backend.src import metrics
+from backend.src.config import settings
+from backend.src.resources import registry
+
+import typing as t
+
+import aiohttp
+
+
+async def _on_connection_created(*_: t.Any) -> None:
+    metrics.MOODLE_CONNECTIONS.labels("created").inc()
+
+
+async def _on_connection_reused(*_: t.Any) -> None:
+    metrics.MOODLE_CONNECTIONS.labels("reused").inc()
+
+
+async def _on_dns_cache_hit(*_: t.Any) -> None:
+    metrics.MOODLE_DNS_LOOKUPS.labels("hit").inc()
+
+
+async def _on_dns_cache_miss(*_: t.Any) -> None:
+    metrics.MOODLE_DNS_LOOKUPS.labels("miss").inc()
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """Trace connection reuse and DNS cache of sessions."""
+    config = aiohttp.TraceConfig()
+    config.on_connection_create_end.append(_on_connection_created)
+    config.on_connection_reuseconn.append(_on_connection_reused)
+    config.on_dns_cache_hit.append(_on_dns_cache_hit)
+    config.on_dns_cache_miss.append(_on_dns_cache_miss)
+    return config
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Build session with connector tuned by settings."""
+    connector = aiohttp.TCPConnector(
+        limit=settings.MOODLE_HTTP_LIMIT,
+        limit_per_host=settings.MOODLE_HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=settings.MOODLE_HTTP_KEEPALIVE,
+        ttl_dns_cache=settings.MOODLE_HTTP_DNS_TTL,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(
+            total=settings.MOODLE_HTTP_TIMEOUT,
+            connect=settings.MOODLE_HTTP_CONNECT_TIMEOUT
+        ),
+        trace_configs=[trace_config()]
+    )
+
+
+def session() -> aiohttp.ClientSession:
+    """Get HTTP session shared by Moodle clients of current event loop."""
+    return registry.get(
+        "MOODLE_HTTP", create_session, closer=aiohttp.ClientSession.close, per_loop=True
+    )
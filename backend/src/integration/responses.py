@@ -0,0 +1,144 @@
+"""
+Cache of read-only Moodle web service responses.
+
+Responses are cached per account, web service function and normalized
+parameters, in an in-process LRU in front of Redis. Entries past their
+TTL are still served for a stale window while being refreshed in
+background, and concurrent misses of one key share a single upstream call.
+"""
+from backend.src import cache, metrics
+from backend.src.config import settings
+from backend.src.resources import registry
+from backend.src.integration import logger
+
+import typing as t
+import json
+import time
+import asyncio
+import hashlib
+
+
+Loader = t.Callable[[], t.Awaitable[t.Any]]
+
+
+class Entry(t.TypedDict):
+    value: t.Any
+    # Wall clock, entries are shared between processes
+    fresh_until: float
+    stale_until: float
+
+
+class ResponseCache:
+    """Two-level cache of responses with stale-while-revalidate."""
+
+    namespace = "moodle_responses"
+
+    def __init__(
+        self,
+        ttls: t.Dict[str, float] = settings.MOODLE_RESPONSE_TTL,
+        stale: float = settings.MOODLE_RESPONSE_STALE
+    ) -> None:
+        self.ttls = ttls
+        self.stale = stale
+        self.local: cache.TTLCache[str, Entry] = cache.TTLCache(
+            maxsize=settings.MOODLE_RESPONSE_CACHE_SIZE, ttl=stale
+        )
+        cache.register(self.namespace, self.local)
+        self._refreshes: t.Set[asyncio.Task] = set()
+
+    def ttl(self, function: str) -> float | None:
+        """TTL of function responses, None when they are not cached."""
+        return self.ttls.get(function)
+
+    @staticmethod
+    def key(account: str, function: str, params: t.Dict[str, t.Any] | None) -> str:
+        normalized = json.dumps(
+            sorted((name, str(value)) for name, value in (params or {}).items())
+        )
+        return hashlib.sha256(
+            "\0".join((account, function, normalized)).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"moodle:responses:{key}"
+
+    @staticmethod
+    def _inflight() -> t.Dict[str, asyncio.Task]:
+        return registry.get("MOODLE_INFLIGHT", dict, per_loop=True)
+
+    async def _lookup(self, key: str) -> Entry | None:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        try:
+            cached = await settings.AIOREDIS.get(self._redis_key(key))
+        except Exception as error:
+            logger.warning(f"failed to read cached Moodle response: {error}")
+            return None
+        if cached is None:
+            return None
+        entry = json.loads(cached)
+        self.local.set(key, entry, ttl=entry["stale_until"] - time.time())
+        return entry
+
+    async def _fill(self, key: str, ttl: float, loader: Loader) -> t.Any:
+        value = await loader()
+        now = time.time()
+        entry = Entry(value=value, fresh_until=now + ttl, stale_until=now + ttl + self.stale)
+        self.local.set(key, entry, ttl=ttl + self.stale)
+        try:
+            await settings.AIOREDIS.set(
+                self._redis_key(key), json.dumps(entry), ex=int(ttl + self.stale) or 1
+            )
+        except Exception as error:
+            logger.warning(f"failed to cache Moodle response: {error}")
+        return value
+
+    def _load(self, key: str, ttl: float, loader: Loader) -> t.Tuple[asyncio.Task, bool]:
+        """Task loading key, shared with concurrent callers of the same key."""
+        inflight = self._inflight()
+        task = inflight.get(key)
+        if task is not None:
+            return task, True
+        task = asyncio.create_task(self._fill(key, ttl, loader))
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+        return task, False
+
+    def _revalidate(self, key: str, ttl: float, loader: Loader) -> None:
+        task, _ = self._load(key, ttl, loader)
+        self._refreshes.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._refreshes.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"failed to refresh Moodle response: {task.exception()}")
+
+        task.add_done_callback(done)
+
+    async def fetch(self, key: str, function: str, loader: Loader) -> t.Any:
+        """Cached response of function, loaded with loader on miss."""
+        ttl = self.ttls[function]
+        entry = await self._lookup(key)
+        if entry is None:
+            # Could have been filled by concurrent call while Redis was read
+            entry = self.local.get(key)
+        now = time.time()
+        if entry is not None and now < entry["fresh_until"]:
+            metrics.MOODLE_RESPONSE_CACHE.labels(function, "hit").inc()
+            return entry["value"]
+        if entry is not None and now < entry["stale_until"]:
+            metrics.MOODLE_RESPONSE_CACHE.labels(function, "stale").inc()
+            self._revalidate(key, ttl, loader)
+            return entry["value"]
+
+        task, shared = self._load(key, ttl, loader)
+        metrics.MOODLE_RESPONSE_CACHE.labels(
+            function, "coalesced" if shared else "miss"
+        ).inc()
+        # Waiter being cancelled must not cancel the call others wait for
+        return await asyncio.shield(task)
+
+
+responses = ResponseCache()
@@ -0,0 +1,146 @@
+"""
+Concurrent sync of courses, assignments and submissions from Moodle.
+
+Requests fan out across chunks of courses and then of their assignments,
+at most `concurrency` of them in flight. Results are streamed through a
+bounded queue as they arrive, so a slow consumer pauses fetching instead
+of letting results pile up in memory.
+"""
+from backend.src.integration.client import APIClient, chunks
+from backend.src.integration.models import Assignment, Submission
+
+import typing as t
+import asyncio
+
+
+class CourseAssignments(t.NamedTuple):
+    """Assignments of one course."""
+    course_id: int
+    assignments: t.List[Assignment]
+
+
+class AssignmentSubmissions(t.NamedTuple):
+    """Submissions of one assignment."""
+    assignment: Assignment
+    submissions: t.List[Submission]
+
+
+SyncResult = t.Union[CourseAssignments, AssignmentSubmissions]
+
+
+class _Failed(t.NamedTuple):
+    error: BaseException
+
+
+_DONE = object()
+
+
+class SyncEngine:
+    """Stream results of syncing courses with bounded parallelism."""
+
+    def __init__(
+        self,
+        client: APIClient,
+        concurrency: int = 8,
+        queue_size: int = 64,
+        submissions: bool = True
+    ) -> None:
+        self.client = client
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.submissions = submissions
+
+    async def _assignments(
+        self,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+        course_ids: t.List[int]
+    ) -> t.List[Assignment]:
+        async with semaphore:
+            grouped = await self.client.get_courses_assignments(course_ids)
+        for course_id, assignments in grouped.items():
+            await queue.put(CourseAssignments(course_id, assignments))
+        return [assignment for found in grouped.values() for assignment in found]
+
+    async def _submissions(
+        self,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+        assignments: t.List[Assignment]
+    ) -> None:
+        async with semaphore:
+            grouped = await self.client.get_assignments_submissions(
+                assignment.id for assignment in assignments
+            )
+        for assignment in assignments:
+            await queue.put(AssignmentSubmissions(assignment, grouped[assignment.id]))
+
+    async def _produce(self, queue: asyncio.Queue, course_ids: t.List[int]) -> None:
+        """Run all requests, cancel remaining ones once any has failed."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        size = self.client.config.batch_size
+        # Tasks fetching assignments, their results fan out to submissions
+        fetching: t.Set[asyncio.Task] = {
+            asyncio.create_task(self._assignments(semaphore, queue, chunk))
+            for chunk in chunks(course_ids, size)
+        }
+        pending = set(fetching)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Retrieve every failure, raise the first one
+                errors = [
+                    error for error in (task.exception() for task in done)
+                    if error is not None
+                ]
+                if errors:
+                    raise errors[0]
+                for task in done:
+                    if not self.submissions or task not in fetching:
+                        continue
+                    found = {assignment.id: assignment for assignment in task.result()}
+                    pending.update(
+                        asyncio.create_task(self._submissions(
+                            semaphore, queue, [found[id] for id in chunk]
+                        )) for chunk in chunks(found, size)
+                    )
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run(self, queue: asyncio.Queue, course_ids: t.Iterable[int] | None) -> None:
+        try:
+            if course_ids is None:
+                course_ids = [course.id for course in await self.client.get_courses()]
+            await self._produce(queue, list(course_ids))
+        except Exception as error:
+            await queue.put(_Failed(error))
+        else:
+            await queue.put(_DONE)
+
+    async def stream(self, course_ids: t.Iterable[int] | None = None) -> t.AsyncGenerator[SyncResult, None]:
+        """Yield results as they arrive, all courses of user by default.
+
+        The first failure stops all requests and is raised from here.
+        Closing the generator early, e.g. within `contextlib.aclosing`,
+        cancels requests still running.
+        """
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        producer = asyncio.create_task(self._run(queue, course_ids))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failed):
+                    raise item.error
+                yield item
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
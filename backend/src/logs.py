@@ -0,0 +1,143 @@
+"""
+Non-blocking logging pipeline.
+
+Loggers only put records into a bounded queue, a listener thread formats
+them and writes them into stream and file handlers, so slow disks and log
+rotation never block the event loop. When the queue is full records below
+WARNING are dropped, more severe ones evict the oldest queued record.
+"""
+from backend.src import metrics
+from backend.src.config import settings
+from backend.src.resources import registry
+
+import typing as t
+import json
+import zlib
+import queue
+import random
+import logging
+import contextvars
+import logging.handlers as lhandlers
+from datetime import datetime, timezone
+
+
+request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach id of request being handled to records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Pass only a fraction of DEBUG records.
+
+    Records of the same request are kept or dropped together, so sampled
+    requests could still be followed from start to end.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        current = request_id.get()
+        if current is None:
+            return random.random() < self.rate
+        return zlib.crc32(current.encode()) % 10000 < self.rate * 10000
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: t.Dict[str, t.Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(lhandlers.QueueHandler):
+    """Queue records without ever blocking caller."""
+
+    def __init__(self, records: queue.Queue) -> None:
+        super().__init__(records)
+        self.dropped = 0
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        metrics.LOG_RECORDS_DROPPED.inc()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                return self._drop()
+        try:
+            self.queue.get_nowait()
+            self._drop()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop()
+
+
+class QueueListener(lhandlers.QueueListener):
+    """Listener waiting for room to enqueue its stop sentinel."""
+
+    def enqueue_sentinel(self) -> None:
+        # Queue is being drained by listener thread, so waiting is bounded
+        self.queue.put(self._sentinel)
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_JSON:
+        return JSONFormatter()
+    return logging.Formatter(settings.LOG_FORMAT)
+
+
+def listener() -> QueueListener:
+    """Get listener writing queued records, started on first access."""
+    def build() -> QueueListener:
+        formatter = _formatter()
+        for target in settings.LOG_HANDLERS:
+            target.setFormatter(formatter)
+        listener = QueueListener(
+            handler.queue, *settings.LOG_HANDLERS, respect_handler_level=True
+        )
+        listener.start()
+        return listener
+
+    return registry.get("LOG_LISTENER", build, closer=QueueListener.stop)
+
+
+handler = BoundedQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+handler.addFilter(RequestContextFilter())
+if settings.ENVIRONMENT == "prod" and settings.LOG_DEBUG_SAMPLE_RATE < 1:
+    handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+
+def setup(logger: logging.Logger | None = None) -> None:
+    """Route records of logger, root by default, through the queue."""
+    logger = logger or logging.getLogger()
+    logger.setLevel(settings.LOG_LEVEL)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    listener()
@@ -0,0 +1,121 @@
+"""
+Event loop lag monitor.
+
+A probe task sleeps for a fixed interval and measures how late it wakes
+up, which is the time other callbacks held the loop. A watchdog thread
+notices when the probe stops waking up altogether and logs the stack of
+loop thread, pointing right at the blocking call.
+"""
+from backend.src import metrics
+from backend.src.config import settings
+from backend.src.resources import registry
+
+import typing as t
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measure lag of current event loop, times are in seconds."""
+
+    quantiles: t.Tuple[float, ...] = (0.5, 0.9, 0.99, 1.0)
+
+    def __init__(
+        self,
+        interval: float = settings.LOOP_MONITOR_INTERVAL,
+        threshold: float = settings.LOOP_LAG_THRESHOLD,
+        window: int = settings.LOOP_LAG_WINDOW
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: t.Deque[float] = deque(maxlen=window)
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._probe: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def percentiles(self) -> t.Dict[float, float]:
+        """Lag quantiles over recent window, nearest rank."""
+        if not self.lags:
+            return {}
+        lags = sorted(self.lags)
+        return {
+            quantile: lags[min(len(lags) - 1, int(quantile * len(lags)))]
+            for quantile in self.quantiles
+        }
+
+    def record(self, lag: float) -> None:
+        self.lags.append(lag)
+        metrics.EVENT_LOOP_LAG.observe(lag)
+        for quantile, value in self.percentiles().items():
+            metrics.EVENT_LOOP_LAG_QUANTILE.labels(str(quantile)).set(value)
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            lag = max(0.0, time.perf_counter() - expected)
+            self.record(lag)
+            if lag > self.threshold:
+                logger.warning(f"event loop was blocked for {lag * 1000:.0f}ms")
+
+    def _watch(self, thread_id: int) -> None:
+        """Log stack of loop thread once per stall."""
+        reported = None
+        while not self._stopping.wait(self.threshold / 2):
+            beat = self._beat
+            if time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if reported == beat:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self.stalls += 1
+            metrics.EVENT_LOOP_STALLS.inc()
+            logger.warning(
+                f"event loop blocked over {self.threshold * 1000:.0f}ms at:\n"
+                + "".join(traceback.format_stack(frame))
+            )
+
+    def start(self) -> None:
+        """Start probe and watchdog, must be called from loop thread."""
+        if self._probe is not None and not self._probe.done():
+            return
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._probe = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(threading.get_ident(),),
+            name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._probe is not None and not self._probe.done():
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+
+def monitor() -> LoopMonitor:
+    """Get lag monitor of current event loop."""
+    return registry.get(
+        "LOOP_MONITOR", LoopMonitor, closer=LoopMonitor.stop, per_loop=True
+    )
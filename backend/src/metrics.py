@@ -0,0 +1,157 @@
+"""
+Prometheus metrics of API, workers and their dependencies.
+
+Set PROMETHEUS_MULTIPROC_DIR before starting processes to run multiple
+uvicorn or Celery worker processes, each process then writes its samples
+into memory mapped files of that directory without any coordination, and
+they are only aggregated when /metrics is scraped.
+"""
+import os
+
+from celery import signals
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server
+)
+
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Requests are labelled by route template, never by raw path
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.",
+    ["method", "route"],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled.",
+    ["method", "route"], multiprocess_mode="livesum"
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements executed per HTTP request.",
+    ["method", "route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+)
+
+MOODLE_REQUESTS = Counter(
+    "moodle_requests_total", "Moodle web service calls.",
+    ["wsfunction", "outcome"]
+)
+MOODLE_REQUEST_DURATION = Histogram(
+    "moodle_request_duration_seconds", "Time spent on Moodle web service calls.",
+    ["wsfunction"]
+)
+MOODLE_RESPONSE_CACHE = Counter(
+    "moodle_response_cache_total", "Lookups of cached Moodle responses by result.",
+    ["wsfunction", "result"]
+)
+MOODLE_CONNECTIONS = Counter(
+    "moodle_connections_total", "Connections to Moodle by whether they were reused.",
+    ["event"]
+)
+MOODLE_DNS_LOOKUPS = Counter(
+    "moodle_dns_lookups_total", "DNS lookups of Moodle hosts by cache result.",
+    ["result"]
+)
+
+CELERY_TASKS_PUBLISHED = Counter(
+    "celery_tasks_published_total", "Celery tasks published.", ["task"]
+)
+CELERY_TASKS_FINISHED = Counter(
+    "celery_tasks_finished_total", "Celery tasks finished by workers.",
+    ["task", "state"]
+)
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Time spent running Celery tasks.", ["task"],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+DB_STATEMENTS = Counter(
+    "db_statements_total", "Database statements executed."
+)
+DB_STATEMENT_DURATION = Counter(
+    "db_statement_duration_seconds_total", "Time spent on database statements."
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity", "Connections pools may open, pool size plus overflow.",
+    multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of pools.",
+    multiprocess_mode="livesum"
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time waited for a connection from pool.",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 5, 30)
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts timed out waiting for a connection."
+)
+
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time password hashing waited for a worker.",
+    buckets=(.001, .01, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Time spent on hashing or verifying passwords.",
+    buckets=(.05, .1, .2, .3, .5, .75, 1, 2)
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "Password hashing calls rejected as queue was full."
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of event loop in waking up a sleeping probe.",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+EVENT_LOOP_LAG_QUANTILE = Gauge(
+    "event_loop_lag_quantile_seconds", "Event loop lag quantiles over recent window.",
+    ["quantile"], multiprocess_mode="max"
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Times event loop was blocked over threshold."
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped as logging queue was full."
+)
+
+
+@signals.after_task_publish.connect
+def on_task_published(sender: str | None = None, **_) -> None:
+    CELERY_TASKS_PUBLISHED.labels(task=sender or "unknown").inc()
+
+
+def _registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render() -> bytes:
+    """Render samples of all processes in text exposition format."""
+    return generate_latest(_registry())
+
+
+def serve(port: int) -> None:
+    """Serve metrics from a background thread, for processes without API."""
+    start_http_server(port, registry=_registry())
+
+
+def process_exited(pid: int | None = None) -> None:
+    """Drop live gauges of exited process in multiprocess mode."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
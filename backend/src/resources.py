@@ -0,0 +1,122 @@
+"""
+Process-wide registry of shared resources.
+
+Clients, connection pools and handlers are expensive to build, so they are
+created once on first access and reused until the application shuts down.
+Resources bound to an event loop (asyncio clients) are kept per loop and
+closed when their loop shuts down, e.g. at the end of `asyncio.run`.
+"""
+import typing as t
+import asyncio
+import inspect
+import logging
+import threading
+import weakref
+
+
+logger = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+Closer = t.Callable[[t.Any], t.Any]
+
+
+class ResourceRegistry:
+    """Build resources lazily, share them and close them on shutdown."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._resources: t.Dict[str, t.Tuple[t.Any, Closer | None]] = {}
+        self._loop_resources: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop,
+            t.Dict[str, t.Tuple[t.Any, Closer | None]]
+        ] = weakref.WeakKeyDictionary()
+        self._hooked: weakref.WeakSet[asyncio.AbstractEventLoop] = weakref.WeakSet()
+
+    def _scope(self, per_loop: bool) -> t.Dict[str, t.Tuple[t.Any, Closer | None]]:
+        """Select the storage for process-wide or current loop resources."""
+        if not per_loop:
+            return self._resources
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Accessed outside of any loop, nothing to bind to
+            return self._resources
+        if loop not in self._hooked:
+            self._hook(loop)
+        return self._loop_resources.setdefault(loop, {})
+
+    def _hook(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Close resources of loop before it shuts down async generators.
+
+        Both `asyncio.run` and `asyncio.Runner` do so right before closing
+        the loop, while it could still run closers.
+        """
+        shutdown = loop.shutdown_asyncgens
+
+        async def shutdown_asyncgens() -> None:
+            await self.close_loop()
+            await shutdown()
+
+        try:
+            loop.shutdown_asyncgens = shutdown_asyncgens  # type: ignore[method-assign]
+        except AttributeError:
+            logger.debug("cannot hook shutdown of loop, close_loop() must be called")
+            return
+        self._hooked.add(loop)
+
+    def get(
+        self,
+        name: str,
+        factory: t.Callable[[], T],
+        *,
+        closer: t.Callable[[T], t.Any] | None = None,
+        per_loop: bool = False
+    ) -> T:
+        """Get resource by name, build it with factory on first access."""
+        with self._lock:
+            scope = self._scope(per_loop)
+            if name not in scope:
+                scope[name] = (factory(), closer)
+                logger.debug(f"resource {name} created")
+            return scope[name][0]
+
+    async def close(self) -> None:
+        """Close all resources of current loop and process-wide ones."""
+        with self._lock:
+            resources = list(self._resources.items())
+            self._resources.clear()
+            try:
+                loop = asyncio.get_running_loop()
+                resources += list(self._loop_resources.pop(loop, {}).items())
+            except RuntimeError:
+                pass
+        await self._close(resources)
+
+    async def close_loop(self) -> None:
+        """Close resources of current loop only.
+
+        Called on shutdown of loop already, code running loops which could
+        not be hooked must call it before the loop stops.
+        """
+        with self._lock:
+            resources = list(
+                self._loop_resources.pop(asyncio.get_running_loop(), {}).items()
+            )
+        await self._close(resources)
+
+    @staticmethod
+    async def _close(resources: t.List[t.Tuple[str, t.Tuple[t.Any, Closer | None]]]) -> None:
+        # Close in reverse order of creation, dependent resources go first
+        for name, (resource, closer) in reversed(resources):
+            if closer is None:
+                continue
+            try:
+                result = closer(resource)
+                if inspect.isawaitable(result):
+                    await result
+                logger.debug(f"resource {name} closed")
+            except Exception as error:
+                logger.warning(f"failed to close resource {name}: {error}")
+
+
+registry = ResourceRegistry()
@@ -0,0 +1,187 @@
+"""
+Task status events delivered through Redis pub/sub.
+
+Workers publish status changes of tasks to one channel, each API process
+keeps a single subscription to it and fans events out to its subscribers
+in memory, so the number of Redis connections does not grow with clients.
+"""
+from backend.src.config import settings
+from backend.src.resources import registry
+
+import typing as t
+import typing_extensions as te
+import asyncio
+import logging
+import weakref
+from datetime import datetime
+
+import redis
+import redis.asyncio as aioredis
+from pydantic import BaseModel, ValidationError
+
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEvent(BaseModel):
+    """Status change of a Celery task."""
+    celery_task_id: str
+    status: str
+    result: str | None = None
+    updated_at: datetime | None = None
+
+
+def publish(client: redis.Redis, events: t.Iterable[TaskEvent]) -> None:
+    """Publish events with one pipelined round trip."""
+    with client.pipeline(transaction=False) as pipe:
+        for event in events:
+            pipe.publish(settings.TASK_EVENTS_CHANNEL, event.model_dump_json())
+        pipe.execute()
+
+
+class Subscription:
+    """Events of a set of tasks, only the latest event of each is kept.
+
+    Slow consumers therefore skip intermediate states instead of piling
+    events up in memory. Events are delivered at most once, `missed` is set
+    when some may have been lost, e.g. while channel was resubscribed.
+    Subscription is detached when leaving its context or when it is
+    garbage collected.
+    """
+
+    def __init__(self, hub: "TaskEventHub", celery_task_ids: t.Iterable[str]) -> None:
+        self.hub = hub
+        self.celery_task_ids = set(celery_task_ids)
+        self._events: t.Dict[str, TaskEvent] = {}
+        self._arrived = asyncio.Event()
+        self.missed = False
+        # Subscription dropped without leaving its context leaves no keys
+        weakref.finalize(self, hub._prune, frozenset(self.celery_task_ids))
+
+    def __enter__(self) -> te.Self:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.hub._detach(self)
+
+    def deliver(self, event: TaskEvent) -> None:
+        self._events[event.celery_task_id] = event
+        self._arrived.set()
+
+    def invalidate(self) -> None:
+        """Mark events as possibly missed and wake up consumer."""
+        self.missed = True
+        self._arrived.set()
+
+    async def get(self, timeout: float | None = None) -> t.List[TaskEvent]:
+        """Wait for events, return empty list when timed out."""
+        try:
+            await asyncio.wait_for(self._arrived.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._arrived.clear()
+        events, self._events = self._events, {}
+        return list(events.values())
+
+
+class TaskEventHub:
+    """Single channel subscription of an event loop shared by subscribers."""
+
+    def __init__(self, client: aioredis.Redis) -> None:
+        self.client = client
+        self._subscriptions: t.Dict[str, weakref.WeakSet[Subscription]] = {}
+        self._subscribed = asyncio.Event()
+        self._reader: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    def subscribe(self, celery_task_ids: t.Iterable[str]) -> Subscription:
+        """Subscribe events of tasks, use subscription as context manager."""
+        subscription = Subscription(self, celery_task_ids)
+        self._attach(subscription)
+        return subscription
+
+    async def ready(self) -> None:
+        """Wait until channel subscription is established."""
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        await self._subscribed.wait()
+
+    def _attach(self, subscription: Subscription) -> None:
+        for celery_task_id in subscription.celery_task_ids:
+            self._subscriptions.setdefault(
+                celery_task_id, weakref.WeakSet()).add(subscription)
+
+    def _detach(self, subscription: Subscription) -> None:
+        for celery_task_id in subscription.celery_task_ids:
+            subs = self._subscriptions.get(celery_task_id, weakref.WeakSet())
+            subs.discard(subscription)
+            if not subs:
+                self._subscriptions.pop(celery_task_id, None)
+
+    def _prune(self, celery_task_ids: t.FrozenSet[str]) -> None:
+        """Remove tasks left without live subscriptions."""
+        for celery_task_id in celery_task_ids:
+            subs = self._subscriptions.get(celery_task_id)
+            # Reference being collected may not have been removed yet
+            if subs is not None and not list(subs):
+                del self._subscriptions[celery_task_id]
+
+    def _dispatch(self, data: bytes) -> None:
+        try:
+            event = TaskEvent.model_validate_json(data)
+        except ValidationError as error:
+            logger.warning(f"malformed task event ignored: {error}")
+            return
+        subs = self._subscriptions.get(event.celery_task_id)
+        if subs is None:
+            return
+        if not subs:
+            del self._subscriptions[event.celery_task_id]
+        for subscription in list(subs):
+            subscription.deliver(event)
+
+    def _invalidate(self) -> None:
+        for subs in list(self._subscriptions.values()):
+            for subscription in list(subs):
+                subscription.invalidate()
+
+    async def _read(self) -> None:
+        """Read channel forever, reconnect when connection is lost."""
+        connected = False
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.TASK_EVENTS_CHANNEL)
+                    self._subscribed.set()
+                    if connected:
+                        # Events published while reconnecting are lost
+                        self._invalidate()
+                    connected = True
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self._subscribed.clear()
+                logger.error(f"task events subscription lost: {error}")
+                await asyncio.sleep(1)
+
+    async def close(self) -> None:
+        if self._reader is None:
+            return
+        self._reader.cancel()
+        try:
+            await self._reader
+        except asyncio.CancelledError:
+            pass
+
+
+def hub() -> TaskEventHub:
+    """Get event hub of current event loop."""
+    return registry.get(
+        "TASK_EVENTS", lambda: TaskEventHub(settings.AIOREDIS),
+        closer=TaskEventHub.close, per_loop=True
+    )
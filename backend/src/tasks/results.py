@@ -0,0 +1,42 @@
+"""
+Read Celery task results without blocking the event loop.
+
+Task meta is fetched from the redis result backend with the asyncio client,
+decoding is left to the Celery backend so serializer settings are honoured.
+"""
+from backend.src.config import settings
+
+import typing as t
+
+from celery import states
+
+
+class TaskState(t.NamedTuple):
+    """State and result of a Celery task as stored in result backend."""
+    state: str
+    result: t.Any = None
+
+
+def _decode(payload: bytes | None) -> TaskState:
+    """Decode task meta, missing meta means task is unknown or pending."""
+    if payload is None:
+        return TaskState(states.PENDING)
+    meta = settings.CELERY.backend.decode(payload)
+    return TaskState(meta["status"], meta.get("result"))
+
+
+async def fetch_state(celery_task_id: str) -> TaskState:
+    """Fetch state of single task with one GET."""
+    key = settings.CELERY.backend.get_key_for_task(celery_task_id)
+    return _decode(await settings.AIOREDIS_BROKER.get(key))
+
+
+async def fetch_states(celery_task_ids: t.Sequence[str]) -> t.List[TaskState]:
+    """Fetch states of multiple tasks with one MGET, in the given order."""
+    if not celery_task_ids:
+        return []
+    backend = settings.CELERY.backend
+    payloads = await settings.AIOREDIS_BROKER.mget([
+        backend.get_key_for_task(id) for id in celery_task_ids
+    ])
+    return [_decode(payload) for payload in payloads]
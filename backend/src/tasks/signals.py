@@ -0,0 +1,263 @@
+"""
+Push task status from Celery workers into the Task table.
+
+Signal handlers only queue status changes, a background thread of each
+worker process writes them into database in batches and then publishes
+them as task events. This module is loaded by workers through the `include`
+option of Celery application.
+"""
+from backend.src import metrics
+from backend.src.config import settings
+from backend.src.database import engine
+from backend.src.database.task import (
+    Task,
+    TaskStatus,
+    TaskStatusFinal
+)
+from backend.src.tasks.events import TaskEvent, publish
+
+import typing as t
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+
+from celery import signals, states
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatusChange(t.NamedTuple):
+    """Status change of a task waiting for being written."""
+    status: TaskStatus
+    result: str | None
+    updated_at: datetime
+    attempts: int = 0
+
+
+class StatusWriter:
+    """Collect status changes of tasks and write them in batches."""
+
+    def __init__(
+        self,
+        interval: float = settings.TASK_STATUS_FLUSH_INTERVAL,
+        batch_size: int = settings.TASK_STATUS_BATCH_SIZE,
+        retries: int = settings.TASK_STATUS_RETRIES,
+        persist: bool = settings.TASK_STATUS_PUSH,
+        autostart: bool = True
+    ) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retries = retries
+        self.persist = persist
+        # Tests flush by themselves, without thread writing concurrently
+        self.autostart = autostart
+        self._reset()
+
+    def _reset(self) -> None:
+        """Reset state, threads do not survive forking of worker processes."""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pending: t.Dict[str, StatusChange] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def push(self, celery_task_id: str, status: TaskStatus, result: str | None = None) -> None:
+        """Queue status change, only the latest one of each task is kept."""
+        if self._pid != os.getpid():
+            self._reset()
+        change = StatusChange(
+            status, result, datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+        with self._lock:
+            self._pending[celery_task_id] = change
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        if self.autostart:
+            self.start()
+
+    def start(self) -> None:
+        """Start writer thread unless it is running."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="task-status-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _retry(self, changes: t.Dict[str, StatusChange]) -> None:
+        """Put changes back for another attempt unless out of retries.
+
+        Newer changes queued meanwhile win over the ones put back.
+        """
+        dropped = 0
+        with self._lock:
+            for celery_task_id, change in changes.items():
+                if change.attempts >= self.retries:
+                    dropped += 1
+                    continue
+                self._pending.setdefault(
+                    celery_task_id, change._replace(attempts=change.attempts + 1)
+                )
+        if dropped:
+            logger.warning(f"dropped status changes of {dropped} tasks out of retries")
+
+    async def flush(self, engine: AsyncEngine) -> int:
+        """Write and publish queued changes, return number of changes done."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        if self.persist:
+            batch = await self._write(engine, batch)
+
+        # Subscribers are notified after database has been updated
+        try:
+            publish(settings.REDIS, (
+                TaskEvent(
+                    celery_task_id=celery_task_id,
+                    status=change.status.value,
+                    result=change.result,
+                    updated_at=change.updated_at
+                ) for celery_task_id, change in batch.items()
+            ))
+        except Exception as error:
+            logger.warning(f"failed to publish task events: {error}")
+        return len(batch)
+
+    async def _write(self, engine: AsyncEngine, batch: t.Dict[str, StatusChange]) -> t.Dict[str, StatusChange]:
+        """Write changes within one transaction, return changes written."""
+        statement = update(Task).where(
+            Task.celery_task_id == bindparam("_id"),
+            Task.status.not_in(TaskStatusFinal)  # type: ignore
+        ).values(
+            status=bindparam("_status"),
+            celery_task_result=bindparam("_result"),
+            updated_at=bindparam("_updated_at")
+        )
+        try:
+            async with engine.begin() as conn:
+                # Task row may be created by API after worker picked task up
+                existing = set((await conn.execute(
+                    select(Task.celery_task_id).where(
+                        Task.celery_task_id.in_(batch)  # type: ignore
+                    )
+                )).scalars())
+                if existing:
+                    await conn.execute(statement, [
+                        {
+                            "_id": celery_task_id,
+                            "_status": change.status,
+                            "_result": change.result,
+                            "_updated_at": change.updated_at
+                        } for celery_task_id, change in batch.items()
+                        if celery_task_id in existing
+                    ])
+        except Exception:
+            self._retry(batch)
+            raise
+
+        self._retry({
+            celery_task_id: change for celery_task_id, change in batch.items()
+            if celery_task_id not in existing
+        })
+        return {
+            celery_task_id: change for celery_task_id, change in batch.items()
+            if celery_task_id in existing
+        }
+
+    def _run(self) -> None:
+        """Flush changes periodically within a private event loop.
+
+        Interval doubles with each failed flush in a row, up to 64 times.
+        """
+        loop = asyncio.new_event_loop()
+        failures = 0
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.interval * 2 ** min(failures, 6))
+            self._wakeup.clear()
+            try:
+                loop.run_until_complete(self.flush(engine))
+                failures = 0
+            except Exception as error:
+                failures += 1
+                logger.error(f"failed to write task status: {error}")
+        try:
+            loop.run_until_complete(self.flush(engine))
+            loop.run_until_complete(engine.dispose())
+        finally:
+            loop.close()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop writer thread after the last flush."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        thread.join(timeout)
+
+
+writer = StatusWriter()
+# Start time of tasks running in this process, keyed by task id
+started: t.Dict[str, float] = {}
+
+
+@signals.task_prerun.connect
+def on_task_prerun(task_id: str, **_) -> None:
+    started[task_id] = time.perf_counter()
+    writer.push(task_id, TaskStatus.STARTED)
+
+
+@signals.task_postrun.connect
+def on_task_postrun(task_id: str, task: t.Any, retval: t.Any, state: str, **_) -> None:
+    start = started.pop(task_id, None)
+    metrics.CELERY_TASKS_FINISHED.labels(task.name, state or "UNKNOWN").inc()
+    if start is not None:
+        metrics.CELERY_TASK_DURATION.labels(task.name).observe(time.perf_counter() - start)
+    # Failures are recorded by failure handler
+    if state == states.FAILURE:
+        return
+    try:
+        status = TaskStatus(state.lower())
+    except ValueError:
+        return
+    result = str(retval) if status == TaskStatus.SUCCESS else None
+    writer.push(task_id, status, result)
+
+
+@signals.task_failure.connect
+def on_task_failure(task_id: str, **_) -> None:
+    writer.push(task_id, TaskStatus.FAILURE)
+
+
+@signals.task_retry.connect
+def on_task_retry(request: t.Any, **_) -> None:
+    writer.push(request.id, TaskStatus.RETRY)
+
+
+@signals.task_revoked.connect
+def on_task_revoked(request: t.Any, **_) -> None:
+    writer.push(request.id, TaskStatus.REVOKED)
+
+
+@signals.worker_ready.connect
+def on_worker_ready(**_) -> None:
+    if settings.METRICS_WORKER_PORT is not None:
+        metrics.serve(settings.METRICS_WORKER_PORT)
+
+
+@signals.worker_process_shutdown.connect
+@signals.worker_shutdown.connect
+def on_worker_shutdown(**_) -> None:
+    writer.stop()
+    metrics.process_exited()
@@ -3,15 +3,18 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from httpx import ASGITransport, AsyncClient
 
 import typing as t
+from contextlib import contextmanager
 
 from backend.src import app
 from backend.tests import mockdata
+from backend.tests.mockmoodle import MockMoodle
 from backend.src.config import settings
 from backend.src.integration.client import (
     APIClient,
     MoodleConfig
 )
 from backend.src.database import init, engine
+from backend.src.database.instrument import QueryStats, collect
 from backend.src.database.user import (
     User,
     Group
@@ -45,6 +48,28 @@ async def client(config: MoodleConfig) -> t.AsyncGenerator[APIClient, None]:
         yield client
 
 
+@pytest.fixture
+async def moodle() -> t.AsyncGenerator[MockMoodle, None]:
+    """Local mock Moodle server."""
+    moodle = MockMoodle()
+    await moodle.start()
+    yield moodle
+    await moodle.close()
+
+
+@pytest.fixture
+async def mock_client(moodle: MockMoodle) -> t.AsyncGenerator[APIClient, None]:
+    """Moodle API client connected to mock Moodle."""
+    async with APIClient(MoodleConfig(
+        username="user",
+        password="pass",
+        base_url=moodle.base_url,
+        service="moodle_mobile_app",
+        batch_size=2
+    )) as client:
+        yield client
+
+
 @pytest.fixture(scope="session", autouse=True)
 async def session() -> t.AsyncGenerator[AsyncSession, None]:
     """Fixture to initialize and provide a database session for tests."""
@@ -66,7 +91,7 @@ async def group(session: AsyncSession) -> t.AsyncGenerator[Group, None]:
     await session.refresh(group)
     yield group
     await session.delete(group)
-    await session.flush()
+    await session.commit()
 
 
 @pytest.fixture(scope="module")
@@ -84,13 +109,15 @@ async def user(group: Group, session: AsyncSession) -> t.AsyncGenerator[User, No
     await group.add_user(session, user=user)
     yield user
     await session.delete(user)
-    await session.flush()
+    await session.commit()
 
 
 @pytest.fixture(scope="function")
 async def token(session: AsyncSession, user: User) -> str:
     """Generate JWT Token for testing."""
     token = await JWTToken.create(session, user=user)
+    # Issuing commits, which expires user shared by tests of module
+    await session.refresh(user)
     return token.access_token
 
 
@@ -98,6 +125,7 @@ async def token(session: AsyncSession, user: User) -> str:
 async def jwt(session: AsyncSession, user: User) -> JWTToken:
     """Generate JWT Token for testing."""
     token = await JWTToken.create(session, user=user)
+    await session.refresh(user)
     return token
 
 
@@ -109,3 +137,17 @@ async def api() -> t.AsyncGenerator[AsyncClient, None]:
         base_url=f"http://{settings.PROJECT_NAME}.test/api/{settings.API_VERSION}",
     ) as client:
         yield client
+
+
+@pytest.fixture(scope="function")
+def max_queries() -> t.Callable[[int], t.ContextManager[QueryStats]]:
+    """Assert at most given number of statements are executed in context."""
+    @contextmanager
+    def assert_max_queries(limit: int) -> t.Iterator[QueryStats]:
+        with collect() as stats:
+            yield stats
+        assert stats.count <= limit, (
+            f"{stats.count} statements executed, expected at most {limit}: "
+            f"{list(stats.shapes or [])}"
+        )
+    return assert_max_queries
@@ -0,0 +1,149 @@
+"""
+Local mock of Moodle token and REST web service endpoints.
+
+Serves deterministic courses, assignments and submissions, counts calls of
+each web service function and optionally delays every response, so tests
+and benchmarks could run without a real Moodle.
+"""
+import typing as t
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+
+
+class MockMoodle:
+    """Moodle serving `courses` courses with nested assignments and submissions."""
+
+    token = "mock-token"
+
+    def __init__(
+        self,
+        courses: int = 5,
+        assignments: int = 3,
+        submissions: int = 2,
+        latency: float = 0
+    ) -> None:
+        self.courses = courses
+        self.assignments = assignments
+        self.submissions = submissions
+        self.latency = latency
+        self.calls: t.Counter[str] = Counter()
+        # Functions answering with server errors
+        self.failing: t.Set[str] = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.functions: t.Dict[str, t.Callable[[web.Request], t.Any]] = {
+            "core_webservice_get_site_info": self.site_info,
+            "core_enrol_get_users_courses": self.users_courses,
+            "mod_assign_get_assignments": self.get_assignments,
+            "mod_assign_get_submissions": self.get_submissions,
+        }
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @staticmethod
+    def _ids(request: web.Request, name: str) -> t.List[int]:
+        return [
+            int(value) for key, value in request.query.items()
+            if key.startswith(f"{name}[")
+        ]
+
+    def course_ids(self) -> t.List[int]:
+        return list(range(1, self.courses + 1))
+
+    def assignment_ids(self, course_id: int) -> t.List[int]:
+        return [course_id * 100 + index for index in range(self.assignments)]
+
+    def site_info(self, _: web.Request) -> t.Dict[str, t.Any]:
+        return {
+            "sitename": "Mock Moodle",
+            "username": "user",
+            "firstname": "Mock",
+            "lastname": "User",
+            "userid": 2,
+        }
+
+    def users_courses(self, _: web.Request) -> t.List[t.Dict[str, t.Any]]:
+        return [
+            {"id": id, "shortname": f"C{id}", "fullname": f"Course {id}"}
+            for id in self.course_ids()
+        ]
+
+    def get_assignments(self, request: web.Request) -> t.Dict[str, t.Any]:
+        return {"courses": [
+            {"id": course_id, "assignments": [
+                {
+                    "id": id,
+                    "name": f"Assignment {id}",
+                    "course": course_id,
+                    "intro": "",
+                    "duedate": 1700000000,
+                } for id in self.assignment_ids(course_id)
+            ]} for course_id in self._ids(request, "courseids")
+            if course_id in self.course_ids()
+        ], "warnings": []}
+
+    def get_submissions(self, request: web.Request) -> t.Dict[str, t.Any]:
+        return {"assignments": [
+            {"assignmentid": assignment_id, "submissions": [
+                {
+                    "id": assignment_id * 100 + index,
+                    "userid": index + 1,
+                    "status": "submitted",
+                    "gradingstatus": "notgraded",
+                    "timecreated": 1700000000,
+                    "timemodified": 1700000000,
+                    "plugins": [{"type": "onlinetext", "text": "answer"}],
+                } for index in range(self.submissions)
+            ]} for assignment_id in self._ids(request, "assignmentids")
+        ], "warnings": []}
+
+    async def handle_token(self, request: web.Request) -> web.Response:
+        self.calls["token"] += 1
+        if request.query.get("password") == "wrong":
+            return web.json_response({"error": "Invalid login", "errorcode": "invalidlogin"})
+        return web.json_response({"token": self.token})
+
+    async def handle_rest(self, request: web.Request) -> web.Response:
+        function = request.query.get("wsfunction", "")
+        self.calls[function] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if function in self.failing:
+            return web.json_response({"error": "internal"}, status=500)
+        if request.query.get("wstoken") != self.token:
+            return web.json_response({
+                "exception": "moodle_exception",
+                "errorcode": "invalidtoken",
+                "message": "Invalid token - token not found"
+            })
+        if function not in self.functions:
+            return web.json_response({
+                "exception": "dml_missing_record_exception",
+                "errorcode": "invalidrecord",
+                "message": "Can't find data record in database table external_functions."
+            })
+        return web.json_response(self.functions[function](request))
+
+    async def start(self) -> str:
+        """Listen on a free local port, return base URL."""
+        app = web.Application()
+        app.router.add_get("/login/token.php", self.handle_token)
+        app.router.add_get("/webservice/rest/server.php", self.handle_rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
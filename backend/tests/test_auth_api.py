@@ -1,11 +1,23 @@
 from backend.src import settings
-from backend.src.database.user import User
+from backend.src.database.user import User, Group
 from backend.src.api.models import JWTToken
+from backend.src.database.token import stores
+from backend.src.api.dependencies import (
+    OAuthStateRequired,
+    LoginThrottle,
+    principals
+)
 
+import typing as t
+import uuid
 from datetime import datetime, timezone, timedelta
+from urllib.parse import urlparse, parse_qs
 
 import jwt
+import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 async def test_nonexistent_access_token(api: AsyncClient) -> None:
@@ -87,6 +99,60 @@ async def test_user_password_registration(
     assert "access_token" in data
 
 
+async def test_registration_queries(
+    api: AsyncClient,
+    max_queries: t.Callable[[int], t.ContextManager]
+) -> None:
+    """Test registration is done with one insert of each table."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    with max_queries(2):
+        response = await api.post(
+            "/auth/basic/register",
+            json={"email": email, "name": "Test User", "password": "password"}
+        )
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+    assert response.headers["X-DB-Queries"] == "2"
+
+    response = await api.post(
+        "/auth/basic/register",
+        json={"email": email, "password": "password"}
+    )
+    assert response.status_code == 409
+
+
+async def test_login_queries(
+    api: AsyncClient,
+    session: AsyncSession,
+    group: Group,
+    max_queries: t.Callable[[int], t.ContextManager]
+) -> None:
+    """Test login loads user with groups by one query and replaces refresh token."""
+    await session.refresh(group)
+    name = group.name
+    email = f"{uuid.uuid4().hex}@example.com"
+    response = await api.post(
+        "/auth/basic/register", json={"email": email, "password": "password"}
+    )
+    assert response.status_code == 200
+    user = await User.query(session, email=email)
+    assert user is not None
+    await group.add_user(session, user=user)
+
+    for _ in range(2):
+        with max_queries(3):
+            response = await api.post(
+                "/auth/basic/login", data={"username": email, "password": "password"}
+            )
+        assert response.status_code == 200
+        assert response.headers["X-DB-Queries"] == "3"
+    claims = jwt.decode(
+        response.json()["access_token"],
+        settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+    )
+    assert claims["groups"] == [name]
+
+
 async def test_invalid_access_token(
     api: AsyncClient
 ) -> None:
@@ -176,3 +242,100 @@ async def test_loggout(
         }
     )
     assert response.status_code == 403
+
+
+async def test_oauth_state(api: AsyncClient) -> None:
+    """Test OAuth state could only be consumed once."""
+    response = await api.get("/auth/oauth/redirect")
+    assert response.status_code == 200
+    url = response.json()["url"]
+    state = parse_qs(urlparse(url).query)["state"][0]
+
+    verify = OAuthStateRequired()
+    assert await verify(state, settings.AIOREDIS) == url
+    with pytest.raises(HTTPException):
+        await verify(state, settings.AIOREDIS)
+
+
+async def test_cached_principal(
+    api: AsyncClient,
+    session: AsyncSession
+) -> None:
+    """Test cached user is evicted once it has been changed."""
+    user = await User.create(session, email="cached@example.com", name="Cached User")
+    user_id = str(user.id)
+    token = await JWTToken.create(session, user=user)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    response = await api.get("/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert principals.get(user_id) is not None
+
+    user.is_disabled = True
+    await session.commit()
+    assert principals.get(user_id) is None
+    response = await api.get("/auth/me", headers=headers)
+    assert response.status_code == 422
+
+
+async def test_group_claims(
+    api: AsyncClient,
+    session: AsyncSession,
+    user: User,
+    group: Group
+) -> None:
+    """Test group claims are not trusted once membership has changed."""
+    await session.refresh(group)
+    name = group.name
+    token = await JWTToken.create(session, user=user)
+    claims = jwt.decode(
+        token.access_token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+    )
+    assert name in claims["groups"]
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    await group.remove_user(session, user=user)
+    try:
+        response = await api.get("/auth/confidential", headers=headers)
+        assert response.status_code == 403
+    finally:
+        await group.add_user(session, user=user)
+    response = await api.get("/auth/confidential", headers=headers)
+    assert response.status_code == 200
+
+
+async def test_login_throttle(api: AsyncClient) -> None:
+    """Test login attempts are rejected once bucket of email is empty."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    for _ in range(settings.LOGIN_THROTTLE_EMAIL_BURST):
+        response = await api.post(
+            "/auth/basic/login", data={"username": email, "password": "password"}
+        )
+        assert response.status_code == 401
+    response = await api.post(
+        "/auth/basic/login", data={"username": email, "password": "password"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    # Rejected attempt of one bucket does not take tokens from the other
+    throttle = LoginThrottle(email_burst=1, ip_burst=1)
+    ip = uuid.uuid4().hex
+    assert await throttle.acquire(settings.AIOREDIS, email, ip) > 0
+    assert await throttle.acquire(settings.AIOREDIS, f"other-{email}", ip) == 0
+
+
+@pytest.mark.parametrize("store", stores)
+async def test_refresh_token_store(
+    session: AsyncSession,
+    user: User,
+    store: str
+) -> None:
+    """Test refresh tokens could be looked up until user logs out."""
+    await session.refresh(user)
+    user_id = user.id
+    content = await stores[store].issue(session, user)
+    assert await stores[store].lookup(session, content) == user_id
+    assert await stores[store].lookup(session, "not a refresh token") is None
+    await stores[store].revoke(session, user)
+    assert await stores[store].lookup(session, content) is None
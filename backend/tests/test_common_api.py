@@ -9,6 +9,25 @@ async def test_healthy(api: AsyncClient) -> None:
     assert response.json() == True
 
 
+async def test_livez(api: AsyncClient) -> None:
+    response = await api.get("/livez")
+    assert response.status_code == 200
+    assert response.json() == True
+
+
+async def test_readyz(api: AsyncClient) -> None:
+    response = await api.get("/readyz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ready"] == True
+    assert set(data["checks"]) == {"database", "redis", "worker"}
+    assert all(check["latency"] >= 0 for check in data["checks"].values())
+
+    # Probes are answered from cache
+    response = await api.get("/readyz")
+    assert response.json()["checks"] == data["checks"]
+
+
 async def test_cors_headers(api: AsyncClient) -> None:
     response = await api.options("/health", headers={
         "Origin": settings.CORS_ORIGINS[0],
@@ -20,3 +39,16 @@ async def test_cors_headers(api: AsyncClient) -> None:
     assert response.headers.get(
         "access-control-allow-methods") == "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
     assert response.headers.get("access-control-allow-credentials") == "true"
+
+
+async def test_metrics(api: AsyncClient) -> None:
+    await api.get("/livez")
+    # Metrics are exposed outside versioned API
+    response = await api.get(api.base_url.copy_with(path="/metrics"))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        f'http_requests_total{{method="GET",route="/api/{settings.API_VERSION}/livez",status="200"}}'
+        in response.text
+    )
+    assert "db_statements_total" in response.text
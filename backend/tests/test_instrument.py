@@ -0,0 +1,60 @@
+from backend.src.config import settings
+from backend.src.database import engine_options
+from backend.src.database.instrument import (
+    InstrumentedQueuePool,
+    collect,
+    pool_stats
+)
+from backend.src.database.user import User
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+async def test_collect_nested_statements(session: AsyncSession) -> None:
+    with collect() as outer:
+        await User.query(session, email="nobody@example.com")
+        with collect() as inner:
+            for _ in range(3):
+                await User.query(session, email="nobody@example.com")
+    assert inner.count == 3
+    assert outer.count == 4
+    assert outer.duration >= inner.duration > 0
+    [(shape, count)] = outer.repeated(threshold=3)
+    assert count == 4 and shape.startswith("SELECT")
+    assert inner.repeated(threshold=4) == []
+
+
+async def test_pool_wait_stats() -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", poolclass=InstrumentedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.1
+    )
+    try:
+        async with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+            stats = pool_stats(engine)
+            assert stats is not None
+            assert stats.checked_out == 1 and stats.size == 1
+        stats = pool_stats(engine)
+        assert stats is not None
+        assert stats.acquired == 1 and stats.timeouts == 1
+    finally:
+        await engine.dispose()
+
+
+def test_engine_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert engine_options("sqlite+aiosqlite:///:memory:") == {}
+    options = engine_options("postgresql+asyncpg://postgres@localhost/itmo")
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["connect_args"]["statement_cache_size"] == settings.DB_STATEMENT_CACHE_SIZE
+
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    options = engine_options("postgresql+asyncpg://postgres@localhost/itmo")
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
@@ -1,13 +1,28 @@
 import pytest
 
+import uuid
+import asyncio
+from contextlib import aclosing
+
+from backend.src import metrics
+from backend.src.config import settings
 from backend.src.integration import (
-    APICallingException
+    APICallingException,
+    AuthenticationException
 )
 
 from backend.src.integration.client import (
     APIClient,
     MoodleConfig
 )
+from backend.src.integration.credentials import credentials
+from backend.src.integration.responses import ResponseCache
+from backend.src.integration.sync import (
+    AssignmentSubmissions,
+    CourseAssignments,
+    SyncEngine
+)
+from backend.tests.mockmoodle import MockMoodle
 
 
 async def test_api_client_authentication(config: MoodleConfig) -> None:
@@ -54,3 +69,143 @@ async def test_api_client_get_submission_assignments(client: APIClient) -> None:
     assignments = await client.get_course_assignments(courses[0].id)
     submissions = await client.get_assignment_submissions(assignments[0].id)
     assert submissions
+
+
+async def test_batch_course_assignments(mock_client: APIClient, moodle: MockMoodle) -> None:
+    # Unknown and repeated ids are fetched once, 4 unique ids in chunks of 2
+    assignments = await mock_client.get_courses_assignments([1, 2, 3, 3, 999])
+    assert moodle.calls["mod_assign_get_assignments"] == 2
+    assert set(assignments) == {1, 2, 3, 999}
+    assert [a.id for a in assignments[2]] == moodle.assignment_ids(2)
+    assert all(a.course == 2 for a in assignments[2])
+    assert assignments[999] == []
+
+
+async def test_batch_assignment_submissions(mock_client: APIClient, moodle: MockMoodle) -> None:
+    ids = moodle.assignment_ids(1) + moodle.assignment_ids(2)
+    submissions = await mock_client.get_assignments_submissions(ids)
+    assert moodle.calls["mod_assign_get_submissions"] == 3
+    assert list(submissions) == ids
+    assert all(len(found) == moodle.submissions for found in submissions.values())
+
+    # Single variants go through batch calls
+    assert len(await mock_client.get_assignment_submissions(ids[0])) == moodle.submissions
+
+
+async def test_sync_engine_stream(mock_client: APIClient, moodle: MockMoodle) -> None:
+    moodle.latency = 0.01
+    engine = SyncEngine(mock_client, concurrency=2, queue_size=1)
+    results = [result async for result in engine.stream()]
+
+    courses = [r for r in results if isinstance(r, CourseAssignments)]
+    submissions = [r for r in results if isinstance(r, AssignmentSubmissions)]
+    assert sorted(r.course_id for r in courses) == moodle.course_ids()
+    assert len(submissions) == moodle.courses * moodle.assignments
+    assert moodle.max_in_flight == 2
+
+
+async def test_sync_engine_cancel(mock_client: APIClient, moodle: MockMoodle) -> None:
+    moodle.latency = 0.01
+    moodle.failing.add("mod_assign_get_submissions")
+    with pytest.raises(APICallingException):
+        async for _ in SyncEngine(mock_client).stream():
+            pass
+    await asyncio.sleep(0.05)
+    assert moodle.in_flight == 0
+
+    # Closing stream early cancels requests still running
+    moodle.failing.clear()
+    async with aclosing(SyncEngine(mock_client).stream()) as stream:
+        async for _ in stream:
+            break
+    calls = sum(moodle.calls.values())
+    await asyncio.sleep(0.05)
+    assert sum(moodle.calls.values()) == calls
+
+
+async def test_shared_session(mock_client: APIClient, moodle: MockMoodle) -> None:
+    reused = metrics.MOODLE_CONNECTIONS.labels("reused")._value.get()
+    async with APIClient(mock_client.config) as client:
+        assert client.session is mock_client.session
+        await client.get_courses()
+    # Leaving client keeps shared session open for others
+    assert not mock_client.session.closed
+    await mock_client.get_courses()
+    assert metrics.MOODLE_CONNECTIONS.labels("reused")._value.get() > reused
+
+
+async def test_cached_credentials(mock_client: APIClient, moodle: MockMoodle) -> None:
+    assert moodle.calls["token"] == 1
+    key = credentials.key(moodle.base_url, "user", "moodle_mobile_app", "pass")
+    encrypted = await settings.AIOREDIS.get(f"moodle:credentials:{key}")
+    assert encrypted and moodle.token.encode() not in encrypted
+
+    # Other clients and processes reuse token and site info
+    credentials.local.clear()
+    async with APIClient(mock_client.config) as client:
+        assert client.token == moodle.token
+        assert client.site == mock_client.site
+    assert moodle.calls["token"] == 1
+    assert moodle.calls["core_webservice_get_site_info"] == 1
+
+
+async def test_cached_credentials_wrong_password(mock_client: APIClient, moodle: MockMoodle) -> None:
+    # Cache is warm, yet other password must go through Moodle login
+    config = mock_client.config.model_copy(update={"password": "wrong"})
+    with pytest.raises(AuthenticationException):
+        async with APIClient(config):
+            pass
+    assert moodle.calls["token"] == 2
+
+
+async def test_renew_rejected_token(mock_client: APIClient, moodle: MockMoodle) -> None:
+    moodle.token = "renewed-token"
+    courses = await asyncio.gather(*(mock_client.get_courses() for _ in range(3)))
+    assert all(len(found) == moodle.courses for found in courses)
+    assert moodle.calls["token"] == 2
+    assert mock_client.token == "renewed-token"
+
+    async with APIClient(mock_client.config) as client:
+        assert client.token == "renewed-token"
+
+
+async def test_response_cache_coalescing(mock_client: APIClient, moodle: MockMoodle) -> None:
+    moodle.latency = 0.02
+    found = await asyncio.gather(*(
+        mock_client.get_course_assignments(1) for _ in range(50)
+    ))
+    assert moodle.calls["mod_assign_get_assignments"] == 1
+    assert all(assignments == found[0] for assignments in found)
+
+    # Served from cache afterwards, other parameters are cached apart
+    await mock_client.get_course_assignments(1)
+    await mock_client.get_course_assignments(2)
+    assert moodle.calls["mod_assign_get_assignments"] == 2
+
+
+async def test_response_cache_per_credentials(mock_client: APIClient, moodle: MockMoodle) -> None:
+    await mock_client.get_courses()
+    config = mock_client.config.model_copy(update={"password": "other"})
+    async with APIClient(config) as client:
+        await client.get_courses()
+    assert moodle.calls["core_enrol_get_users_courses"] == 2
+
+
+async def test_response_cache_stale_while_revalidate() -> None:
+    cache = ResponseCache(ttls={"function": 0.05}, stale=10)
+    loads = []
+
+    async def loader() -> int:
+        loads.append(len(loads))
+        return len(loads)
+
+    key = ResponseCache.key(uuid.uuid4().hex, "function", {"id": 1})
+    assert await cache.fetch(key, "function", loader) == 1
+    assert await cache.fetch(key, "function", loader) == 1
+    await asyncio.sleep(0.1)
+
+    # Stale value is returned at once while refreshed in background
+    assert await cache.fetch(key, "function", loader) == 1
+    await asyncio.sleep(0.01)
+    assert len(loads) == 2
+    assert await cache.fetch(key, "function", loader) == 2
@@ -0,0 +1,62 @@
+from backend.src import logs
+
+import json
+import queue
+import logging
+
+from httpx import AsyncClient
+
+
+def _record(level: int, message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 0, message, None, None)
+
+
+async def test_queue_drop_policy() -> None:
+    handler = logs.BoundedQueueHandler(queue.Queue(2))
+    for message in ("first", "second", "debug"):
+        handler.handle(_record(logging.DEBUG if message == "debug" else logging.INFO, message))
+    assert handler.dropped == 1
+
+    # Severe records evict the oldest one instead of being dropped
+    handler.handle(_record(logging.ERROR, "error"))
+    assert handler.dropped == 2
+    queued = [handler.queue.get_nowait().getMessage() for _ in range(2)]
+    assert queued == ["second", "error"]
+
+
+async def test_json_format_with_request_id() -> None:
+    token = logs.request_id.set("abc")
+    try:
+        record = _record(logging.INFO, "hello")
+        logs.RequestContextFilter().filter(record)
+    finally:
+        logs.request_id.reset(token)
+    entry = json.loads(logs.JSONFormatter().format(record))
+    assert entry["message"] == "hello"
+    assert entry["request_id"] == "abc"
+    assert entry["level"] == "INFO"
+
+
+async def test_debug_sampling() -> None:
+    sampling = logs.DebugSamplingFilter(0)
+    assert sampling.filter(_record(logging.INFO, "kept"))
+    assert not sampling.filter(_record(logging.DEBUG, "dropped"))
+
+    # Requests are sampled as a whole
+    sampling = logs.DebugSamplingFilter(0.5)
+    token = logs.request_id.set("request")
+    try:
+        kept = {sampling.filter(_record(logging.DEBUG, "debug")) for _ in range(20)}
+    finally:
+        logs.request_id.reset(token)
+    assert len(kept) == 1
+
+
+async def test_request_id_header(api: AsyncClient) -> None:
+    response = await api.get("/livez", headers={"X-Request-ID": "req-1"})
+    assert response.headers["x-request-id"] == "req-1"
+
+    # Malformed ids are replaced
+    response = await api.get("/livez", headers={"X-Request-ID": "bad id\t"})
+    assert response.headers["x-request-id"] != "bad id\t"
+    assert len(response.headers["x-request-id"]) == 32
@@ -0,0 +1,24 @@
+from backend.src.loop import LoopMonitor
+
+import time
+import asyncio
+import logging
+
+import pytest
+
+
+async def test_loop_lag(caplog: pytest.LogCaptureFixture) -> None:
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    with caplog.at_level(logging.WARNING, logger="backend.src.loop"):
+        # Blocking call is reported with its stack by watchdog
+        time.sleep(0.3)
+        await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert monitor.stalls == 1
+    assert any("time.sleep(0.3)" in record.getMessage() for record in caplog.records)
+    percentiles = monitor.percentiles()
+    assert percentiles[1.0] >= 0.25
+    assert percentiles[0.5] < 0.05
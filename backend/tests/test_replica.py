@@ -0,0 +1,58 @@
+from backend.src.config import settings
+from backend.src.database import engine
+from backend.src.database.replica import ReplicaRouter
+
+import uuid
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+async def test_route_without_replicas() -> None:
+    router = ReplicaRouter(engine, [])
+    assert await router.route() is engine
+    router.pin("someone")
+    assert await router.route("someone") is engine
+
+
+async def test_route_healthy_replicas() -> None:
+    replicas = [
+        create_async_engine("sqlite+aiosqlite:///:memory:"),
+        create_async_engine("sqlite+aiosqlite:////nonexistent/replica.db"),
+        create_async_engine("sqlite+aiosqlite:///:memory:"),
+    ]
+    router = ReplicaRouter(engine, replicas)
+    try:
+        assert [router.choose() for _ in range(3)] == replicas
+
+        # Unreachable replica is skipped after being checked
+        await router.check()
+        assert router.healthy == {replicas[0], replicas[2]}
+        assert {await router.route() for _ in range(4)} == {replicas[0], replicas[2]}
+
+        # Users who have just written read from primary
+        subject = str(uuid.uuid4())
+        router.pin(subject)
+        assert await router.route(subject) is engine
+
+        # Pins of other processes are read from Redis
+        other = str(uuid.uuid4())
+        await router._publish_pin(other)
+        assert await router.route(other) is engine
+    finally:
+        await router.close()
+
+
+async def test_route_pins_unavailable(monkeypatch: pytest.MonkeyPatch) -> None:
+    replica = create_async_engine("sqlite+aiosqlite:///:memory:")
+    router = ReplicaRouter(engine, [replica])
+
+    async def exists(*_) -> int:
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(settings.AIOREDIS, "exists", exists)
+    try:
+        assert await router.route(str(uuid.uuid4())) is engine
+        assert await router.route() is replica
+    finally:
+        await router.close()
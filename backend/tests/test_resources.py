@@ -0,0 +1,52 @@
+from backend.src.config import settings
+from backend.src.resources import ResourceRegistry
+
+import asyncio
+
+
+async def test_settings_resources_are_shared() -> None:
+    assert settings.CELERY is settings.CELERY
+    assert settings.REDIS is settings.REDIS
+    assert settings.OAUTH is settings.OAUTH
+    assert settings.LOG_HANDLERS is settings.LOG_HANDLERS
+
+
+async def test_registry_close_resources() -> None:
+    registry = ResourceRegistry()
+    closed = []
+
+    async def aclose(resource: str) -> None:
+        closed.append(resource)
+
+    registry.get("sync", lambda: "sync", closer=closed.append)
+    registry.get("async", lambda: "async", closer=aclose, per_loop=True)
+    assert registry.get("sync", lambda: "rebuilt") == "sync"
+    await registry.close()
+    assert closed == ["async", "sync"]
+
+    # Resources are rebuilt after closing
+    assert registry.get("sync", lambda: "rebuilt") == "rebuilt"
+
+
+def test_registry_per_loop_resources() -> None:
+    registry = ResourceRegistry()
+
+    async def build() -> object:
+        return registry.get("client", object, per_loop=True)
+
+    first, second = asyncio.run(build()), asyncio.run(build())
+    assert first is not second
+
+
+def test_registry_close_loop_resources() -> None:
+    registry = ResourceRegistry()
+    closed = []
+
+    async def aclose(resource: object) -> None:
+        closed.append(resource)
+
+    async def build() -> object:
+        return registry.get("client", object, closer=aclose, per_loop=True)
+
+    first, second = asyncio.run(build()), asyncio.run(build())
+    assert closed == [first, second]
@@ -5,11 +5,20 @@ from backend.src.database.task import (
     Task,
     TaskStatus
 )
+from backend.src.tasks.events import (
+    TaskEvent,
+    TaskEventHub,
+    hub,
+    publish
+)
 from backend.src import settings
 
+import gc
+import json
 import uuid
 import asyncio
 
+import pytest
 from sqlmodel.ext.asyncio.session import AsyncSession
 from httpx import AsyncClient
 
@@ -72,3 +81,251 @@ async def test_send_task_and_get_result(
     
     # Task should already been finished
     assert response.json()["status"] == "success"
+
+
+async def test_task_event_hub() -> None:
+    """Events published by workers are delivered to subscribers."""
+    events = hub()
+    await events.ready()
+    with events.subscribe(["hub-task-id"]) as subscription:
+        publish(settings.REDIS, [
+            TaskEvent(celery_task_id="other-task-id", status="started"),
+            TaskEvent(celery_task_id="hub-task-id", status="started")
+        ])
+        received = await subscription.get(timeout=5)
+    assert [event.celery_task_id for event in received] == ["hub-task-id"]
+
+
+async def test_task_event_hub_dropped_subscription() -> None:
+    """Subscription dropped without leaving its context leaves no keys behind."""
+    events = hub()
+    subscription = events.subscribe(["dropped-task-id"])
+    assert "dropped-task-id" in events._subscriptions
+    del subscription
+    gc.collect()
+    assert "dropped-task-id" not in events._subscriptions
+
+
+async def test_stream_task_status(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str
+) -> None:
+    """Stream status of a task until it has finished."""
+    tracker = await Task.create(
+        session,
+        celery_task_id="streamed-task-id",
+        owner_id=user.id
+    )
+    request = asyncio.create_task(api.get(
+        "/task/stream",
+        params={"id": str(tracker.id)},
+        headers={"Authorization": f"Bearer {token}"}
+    ))
+    await asyncio.sleep(0.5)
+    publish(settings.REDIS, [TaskEvent(
+        celery_task_id=tracker.celery_task_id,
+        status="success",
+        result="True"
+    )])
+    response = await asyncio.wait_for(request, timeout=5)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    assert [event["status"] for event in events] == ["pending", "success"]
+    assert events[-1]["celery_task_result"] == "True"
+
+
+async def test_stream_lost_event(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Stream notices status changed without event on heartbeat."""
+    monkeypatch.setattr(settings, "TASK_STREAM_HEARTBEAT", 0.2)
+    tracker = await Task.create(
+        session,
+        celery_task_id="lost-event-task-id",
+        owner_id=user.id
+    )
+    request = asyncio.create_task(api.get(
+        "/task/stream",
+        params={"id": str(tracker.id)},
+        headers={"Authorization": f"Bearer {token}"}
+    ))
+    await asyncio.sleep(0.5)
+    tracker.status = TaskStatus.SUCCESS
+    session.add(tracker)
+    await session.commit()
+
+    response = await asyncio.wait_for(request, timeout=5)
+    assert response.status_code == 200
+    statuses = [
+        json.loads(line.removeprefix("data: "))["status"]
+        for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    assert statuses == ["pending", "success"]
+
+
+async def test_task_event_hub_invalidate() -> None:
+    """Subscribers are told events may be lost when channel is resubscribed."""
+    events = hub()
+    await events.ready()
+    with events.subscribe(["missed-task-id"]) as subscription:
+        events._invalidate()
+        assert await subscription.get(timeout=1) == []
+        assert subscription.missed
+
+
+async def test_stream_task_unauthorized(
+    session: AsyncSession,
+    api: AsyncClient,
+    token: str
+) -> None:
+    """Test streaming a task owned by other user."""
+    tracker = await Task.create(
+        session,
+        celery_task_id="others-streamed-task-id",
+        owner_id=uuid.uuid4()
+    )
+    response = await api.get(
+        "/task/stream",
+        params={"id": str(tracker.id)},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 403
+
+
+async def test_stream_events_unavailable(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Streaming is refused while event channel cannot be subscribed."""
+    async def never_ready(_) -> None:
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(TaskEventHub, "ready", never_ready)
+    monkeypatch.setattr(settings, "TASK_EVENTS_READY_TIMEOUT", 0.1)
+    tracker = await Task.create(
+        session,
+        celery_task_id="unavailable-streamed-task-id",
+        owner_id=user.id
+    )
+    response = await asyncio.wait_for(api.get(
+        "/task/stream",
+        params={"id": str(tracker.id)},
+        headers={"Authorization": f"Bearer {token}"}
+    ), timeout=5)
+    assert response.status_code == 503
+
+
+async def test_get_tasks_batch(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str
+) -> None:
+    """Query status of multiple tasks at once."""
+    task = settings.CELERY.send_task("awwh")
+    ids = []
+    for celery_task_id, owner_id in (
+        (task.id, user.id),
+        ("batch-pending-task-id", user.id),
+        ("batch-others-task-id", uuid.uuid4())
+    ):
+        tracker = await Task.create(
+            session, celery_task_id=celery_task_id, owner_id=owner_id
+        )
+        ids.append(str(tracker.id))
+    await asyncio.sleep(1)
+
+    response = await api.post(
+        "/task/batch",
+        json={"ids": ids},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    statuses = {task["id"]: task["status"] for task in response.json()}
+    assert statuses == {ids[0]: "success", ids[1]: "pending"}
+
+
+async def test_wait_task_timeout(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str
+) -> None:
+    """Long polling returns current status once wait timeout expires."""
+    tracker = await Task.create(
+        session,
+        celery_task_id="waited-task-id",
+        owner_id=user.id
+    )
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    response = await api.get(
+        f"/task/{tracker.id}",
+        params={"wait": 0.5},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+    assert loop.time() - start >= 0.5
+
+
+async def test_wait_events_unavailable(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Long polling answers current status once wait expires without events."""
+    async def never_ready(_) -> None:
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(TaskEventHub, "ready", never_ready)
+    tracker = await Task.create(
+        session,
+        celery_task_id="unavailable-waited-task-id",
+        owner_id=user.id
+    )
+    response = await asyncio.wait_for(api.get(
+        f"/task/{tracker.id}",
+        params={"wait": 0.2},
+        headers={"Authorization": f"Bearer {token}"}
+    ), timeout=5)
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+
+async def test_wait_task_finished(
+    session: AsyncSession,
+    api: AsyncClient,
+    user: User,
+    token: str
+) -> None:
+    """Long polling returns as soon as task has finished."""
+    task = settings.CELERY.send_task("awwh")
+    tracker = await Task.create(
+        session,
+        celery_task_id=task.id,
+        owner_id=user.id
+    )
+    response = await api.get(
+        f"/task/{tracker.id}",
+        params={"wait": 10},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
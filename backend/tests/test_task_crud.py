@@ -1,6 +1,7 @@
 import pytest
 import asyncio
 from sqlmodel import select
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.src.config import settings
@@ -9,6 +10,9 @@ from backend.src.database.task import (
     TaskStatus
 )
 from backend.src.database.user import User
+from backend.src.tasks.results import fetch_states
+from backend.src.tasks.signals import StatusWriter
+from backend.src.database import engine
 
 
 async def test_create_successful_task(session: AsyncSession, user: User) -> None:
@@ -66,3 +70,54 @@ async def test_track_multiple_times_task(session: AsyncSession, user: User) -> N
     current_status = tracker.status
     await tracker.update(session)
     assert tracker.status == current_status
+
+
+async def test_fetch_task_states() -> None:
+    task = settings.CELERY.send_task("awwh")
+    await asyncio.sleep(1)
+    finished, unknown = await fetch_states([task.id, "unknown-task-id"])
+    assert finished.state == "SUCCESS"
+    assert finished.result is True
+    assert unknown.state == "PENDING"
+
+
+async def test_write_pushed_task_status(session: AsyncSession, user: User) -> None:
+    tracker = await Task.create(
+        session, celery_task_id="pushed-task-id", owner_id=user.id
+    )
+    writer = StatusWriter(retries=1, persist=True, autostart=False)
+    writer.push(tracker.celery_task_id, TaskStatus.STARTED)
+    writer.push(tracker.celery_task_id, TaskStatus.SUCCESS, "True")
+    writer.push("not-yet-created-task-id", TaskStatus.STARTED)
+    assert await writer.flush(engine) == 1
+
+    # Changes of rows not created yet are retried
+    assert len(writer) == 1
+    assert await writer.flush(engine) == 0
+    assert len(writer) == 0
+
+    await session.refresh(tracker)
+    assert tracker.status == TaskStatus.SUCCESS
+    assert tracker.celery_task_result == "True"
+    assert tracker.updated_at is not None
+
+    # Final status could not be overwritten
+    writer.push(tracker.celery_task_id, TaskStatus.STARTED)
+    await writer.flush(engine)
+    await session.refresh(tracker)
+    assert tracker.status == TaskStatus.SUCCESS
+
+
+async def test_retry_failed_task_status_write() -> None:
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/database.db")
+    writer = StatusWriter(retries=1, persist=True, autostart=False)
+    writer.push("failed-write-task-id", TaskStatus.STARTED)
+    with pytest.raises(Exception):
+        await writer.flush(broken)
+    assert len(writer) == 1
+
+    # Changes are dropped once out of retries
+    with pytest.raises(Exception):
+        await writer.flush(broken)
+    assert len(writer) == 0
+    await broken.dispose()
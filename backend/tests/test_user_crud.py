@@ -1,4 +1,8 @@
+import typing as t
+import asyncio
+
 import pytest
+from prometheus_client import REGISTRY
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.tests import mockdata
@@ -8,6 +12,7 @@ from backend.src.database.user import (
     InvalidLogin,
     PasswordAuthentication
 )
+from backend.src.database.password import PasswordHasher, PasswordHasherBusy
 
 
 @pytest.mark.dependency(name="test_create_user")
@@ -121,3 +126,50 @@ async def test_authenticate_non_exist_user(session: AsyncSession) -> None:
             email="ghost@404.com",
             password="a_supper_secret"
         )
+
+
+def _sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+async def test_password_hasher_backpressure() -> None:
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+    names = (
+        "password_hash_duration_seconds_count",
+        "password_hash_rejected_total",
+        "password_hash_queue_wait_seconds_sum"
+    )
+    before = [_sample(name) for name in names]
+    try:
+        hashing = [asyncio.ensure_future(hasher.hash("password")) for _ in range(3)]
+        results = await asyncio.gather(*hashing, return_exceptions=True)
+        assert isinstance(results[2], PasswordHasherBusy)
+        assert await hasher.verify("password", results[0])
+        calls, rejected, queue_wait = (
+            _sample(name) - value for name, value in zip(names, before)
+        )
+        assert calls == 3
+        assert rejected == 1
+        assert queue_wait > 0
+    finally:
+        hasher.close()
+
+
+async def test_register_and_authenticate(
+    session: AsyncSession,
+    max_queries: t.Callable[[int], t.ContextManager]
+) -> None:
+    with max_queries(2):
+        user = await User.register(
+            session, email="register@example.com", password="password"
+        )
+    assert PasswordAuthentication in await user.list_supported_authentication()
+
+    with max_queries(1):
+        expected_user = await Authentication.authenticate(
+            session,
+            PasswordAuthentication.bitmask,
+            email="register@example.com",
+            password="password"
+        )
+    assert expected_user.id == user.id